@@ -1,32 +1,64 @@
 # auto_solver.py
 
 import os
+import sys
 import time
 import json
 import re
+import hashlib
+from bisect import bisect_right
+from types import MappingProxyType
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Iterable, Iterator, Union, Tuple
 import logging
-from main import AthenaApp
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pdf_processor import get_pdf_files_recursive
 from config import get_config
 from config import paths  
+from utils.rate_limiter import TokenBucket
+from utils.answer_cache import AnswerCache, answer_key
 
 
 logger = logging.getLogger(__name__)
 
-config = get_config()
-USE_CLOUD_DEFAULT = config.use_cloud_by_default
+BANNER = "=" * 80
+
+# RE2 matches in linear time, so the patterns below can't backtrack
+# catastrophically on large PDF text. Falls back to the stdlib engine.
+try:
+    import re2 as fast_re
+except Exception:
+    fast_re = re
+    logger.debug("⚠️ google-re2 not available; using stdlib re for question scanning")
+
+try:
+    import ahocorasick
+except Exception:
+    ahocorasick = None
+    logger.debug("⚠️ pyahocorasick not available; using substring scan for subject detection")
+
+try:
+    import orjson
+except Exception:
+    orjson = None
+
+
+def _json_line(record: Dict) -> bytes:
+    """One JSON Lines record (orjson when available)"""
+    if orjson is not None:
+        return orjson.dumps(record) + b"\n"
+    return json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n"
 
 
 class UniversalQuestionExtractor:
     """Intelligent question extraction from any question paper format"""
     
-    # Comprehensive question patterns for various subjects
+    # Comprehensive question patterns for various subjects.
+    # Patterns must stay RE2-compatible (no lookarounds or backreferences).
     QUESTION_PATTERNS = [
-        # Direct question formats
-        r'^\s*(?:Q\.?|Question)\s*\d+[:\.\)]\s*(.+?)(?=(?:Q\.?|Question)\s*\d+|$)',
-        r'^\s*\d+[\.\)]\s*(.+?)(?=^\s*\d+[\.\)]|$)',
+        # Direct question formats (body is cut at the next "Q<n>" marker)
+        r'^\s*(?:Q\.?|Question)\s*\d+[:\.\)]\s*([^\n]+)',
+        r'^\s*\d+[\.\)]\s*([^\n]+)',
         
         # Command-based questions (common in technical subjects)
         r'\b(Explain|Describe|Define|Discuss|Compare|Differentiate|Derive|Prove|Calculate|Compute|Evaluate|Analyze|Illustrate|Draw|Sketch|Design|Write|List|State|Solve|Find|Determine)\b.{10,}?[.?]',
@@ -36,34 +68,111 @@ class UniversalQuestionExtractor:
         
         # "With respect to" style questions
         r'With\s+(?:respect\s+to|reference\s+to|regard\s+to).{10,}?[.?]',
-        
+    ]
+    
+    # Patterns with no marker or keyword to start at. In the fused
+    # alternation these would match from the earliest position and swallow
+    # every question before them, so each gets a pass of its own.
+    FREE_FORM_PATTERNS = [
         # OR questions (multiple parts)
         r'.{20,}?\s+OR\s+.{20,}?[.?]',
     ]
     
-    # Subject-specific markers for context
-    SUBJECT_INDICATORS = {
-        'mathematics': ['equation', 'theorem', 'proof', 'derivative', 'integral', 'matrix', 'vector'],
-        'physics': ['force', 'energy', 'momentum', 'wave', 'particle', 'field', 'quantum'],
-        'chemistry': ['reaction', 'compound', 'element', 'molecule', 'bond', 'acid', 'base'],
-        'engineering': ['design', 'circuit', 'system', 'algorithm', 'structure', 'analysis'],
-        'computer_science': ['algorithm', 'program', 'database', 'network', 'code', 'function'],
-        'biology': ['cell', 'organism', 'evolution', 'gene', 'protein', 'tissue'],
-        'economics': ['market', 'demand', 'supply', 'price', 'cost', 'production'],
-        'management': ['strategy', 'organization', 'leadership', 'planning', 'control'],
-    }
+    # Subject-specific markers for context (read-only; lookup tables below
+    # are derived from it once at class creation)
+    SUBJECT_INDICATORS = MappingProxyType({
+        'mathematics': ('equation', 'theorem', 'proof', 'derivative', 'integral', 'matrix', 'vector'),
+        'physics': ('force', 'energy', 'momentum', 'wave', 'particle', 'field', 'quantum'),
+        'chemistry': ('reaction', 'compound', 'element', 'molecule', 'bond', 'acid', 'base'),
+        'engineering': ('design', 'circuit', 'system', 'algorithm', 'structure', 'analysis'),
+        'computer_science': ('algorithm', 'program', 'database', 'network', 'code', 'function'),
+        'biology': ('cell', 'organism', 'evolution', 'gene', 'protein', 'tissue'),
+        'economics': ('market', 'demand', 'supply', 'price', 'cost', 'production'),
+        'management': ('strategy', 'organization', 'leadership', 'planning', 'control'),
+    })
+    SUBJECT_KEYWORDS = frozenset(k for keywords in SUBJECT_INDICATORS.values() for k in keywords)
+    SUBJECT_SETS = MappingProxyType({s: frozenset(kws) for s, kws in SUBJECT_INDICATORS.items()})
+    
+    # Question markers that end a question body on the same line
+    QUESTION_MARKER = re.compile(r'(?:Q\.?|Question)\s*\d+', re.IGNORECASE)
+    SECTION_QUESTION_MARKER = re.compile(r'(?:Q\.|Question)\s*\d+')
+    # Where a question starts: a numbered line or a "Q<n>"/"Question <n>"
+    # marker (case-sensitive, so "freq 50" doesn't count)
+    QUESTION_START_RE = re.compile(r'(?m)^[ \t]*\d+[\.\)]|\b(?:Q\.?|Question)\s*\d+')
+    
+    # Precompiled patterns for cleaning and validating candidates
+    WHITESPACE_RE = re.compile(r'\s+')
+    PAGE_NUMBER_RE = re.compile(r'Page\s+\d+', re.IGNORECASE)
+    PAGE_OF_RE = re.compile(r'\d+\s+of\s+\d+')
+    MARKS_BRACKET_RE = re.compile(r'\[\s*\d+\s*(?:marks?|points?)\s*\]', re.IGNORECASE)
+    MARKS_PAREN_RE = re.compile(r'\(\s*\d+\s*(?:marks?|points?)\s*\)', re.IGNORECASE)
+    OR_DIVIDER_RE = re.compile(r'\s+OR\s+')
+    ALPHA_RE = re.compile(r'[a-zA-Z]{3,}')
+    WORD_RE = re.compile(r'[a-z]+')
+    
+    # Common non-question content, fused into one anchored alternation
+    EXCLUDE_RE = re.compile(
+        r'(?:Page|Figure|Table|Diagram|Image)\s+\d+'
+        r'|(?:Time|Duration|Total Marks):'
+        r'|(?:Instructions?|Note|Guidelines?):'
+        r'|(?:UNIVERSITY|COLLEGE|DEPARTMENT)',
+        re.IGNORECASE
+    )
     
     def __init__(self):
-        self.compiled_patterns = [re.compile(p, re.MULTILINE | re.IGNORECASE | re.DOTALL) 
-                                  for p in self.QUESTION_PATTERNS]
+        # All question patterns fused into one alternation so the text is
+        # walked once; each pattern becomes a named group g0..gN and the
+        # match is dispatched on ``lastgroup``. Flags are inline so the
+        # pattern compiles under both RE2 and stdlib re.
+        self.combined_pattern = fast_re.compile(
+            "(?ims)" + "|".join(f"(?P<g{i}>{p})" for i, p in enumerate(self.QUESTION_PATTERNS))
+        )
+        self.numbered_pattern = fast_re.compile(r'(?m)^[ \t\r\f\v]*(\d+)[\.\)][ \t\r\f\v]*([^\n]+)')
+        self.section_split_pattern = fast_re.compile(r'(?i)(?:SECTION|Section|PART|Part)\s+[A-Z]')
+        self.section_question_pattern = fast_re.compile(
+            r'(?ms)(?:Q\.|Question)\s*\d+[:\.\)]?\s*([^\n]+)'
+        )
+        
+        # Group holding the question text for each alternative: the first
+        # inner group if the pattern captures one, otherwise the whole match
+        self._body_groups = {}
+        for i, p in enumerate(self.QUESTION_PATTERNS):
+            outer = self.combined_pattern.groupindex[f"g{i}"]
+            self._body_groups[f"g{i}"] = outer + 1 if re.compile(p).groups else outer
+        self.free_form_patterns = [fast_re.compile("(?ims)" + p) for p in self.FREE_FORM_PATTERNS]
+        
+        # Single automaton over every subject keyword, so subject detection
+        # is one pass over the text instead of one substring scan per keyword
+        self._keyword_automaton = None
+        if ahocorasick is not None:
+            self._keyword_automaton = ahocorasick.Automaton()
+            for keyword in self.SUBJECT_KEYWORDS:
+                self._keyword_automaton.add_word(keyword, keyword)
+            self._keyword_automaton.make_automaton()
     
-    def detect_subject(self, text: str) -> Optional[str]:
-        """Detect the likely subject based on keywords"""
-        text_lower = text.lower()
-        subject_scores = {}
+    def detect_subject(self, text: Union[str, Iterable[str]]) -> Optional[str]:
+        """Detect the likely subject based on keywords (text or iterable of pages)"""
+        chunks = [text] if isinstance(text, str) else text
+        
+        found = set()
+        vocabulary = set()
+        for chunk in chunks:
+            chunk_lower = chunk.lower()
+            if self._keyword_automaton is not None:
+                found.update(keyword for _, keyword in self._keyword_automaton.iter(chunk_lower))
+            else:
+                vocabulary.update(self.WORD_RE.findall(chunk_lower))
+        
+        if vocabulary:
+            # Keywords are plain lowercase words, so a keyword occurs in the
+            # text iff it occurs inside one of its distinct words; scanning
+            # the vocabulary is much shorter than scanning the full text
+            vocab_text = " ".join(vocabulary)
+            found.update(keyword for keyword in self.SUBJECT_KEYWORDS if keyword in vocab_text)
         
-        for subject, keywords in self.SUBJECT_INDICATORS.items():
-            score = sum(1 for keyword in keywords if keyword in text_lower)
+        subject_scores = {}
+        for subject, keywords in self.SUBJECT_SETS.items():
+            score = len(keywords & found)
             if score > 0:
                 subject_scores[subject] = score
         
@@ -74,195 +183,342 @@ class UniversalQuestionExtractor:
     def clean_question(self, text: str) -> str:
         """Clean and normalize extracted question text"""
         # Remove excessive whitespace
-        text = re.sub(r'\s+', ' ', text)
+        text = self.WHITESPACE_RE.sub(' ', text)
         
         # Remove page numbers, headers, footers
-        text = re.sub(r'Page\s+\d+', '', text, flags=re.IGNORECASE)
-        text = re.sub(r'\d+\s+of\s+\d+', '', text)
+        text = self.PAGE_NUMBER_RE.sub('', text)
+        text = self.PAGE_OF_RE.sub('', text)
         
         # Remove marks/points indicators
-        text = re.sub(r'\[\s*\d+\s*(?:marks?|points?)\s*\]', '', text, flags=re.IGNORECASE)
-        text = re.sub(r'\(\s*\d+\s*(?:marks?|points?)\s*\)', '', text, flags=re.IGNORECASE)
+        text = self.MARKS_BRACKET_RE.sub('', text)
+        text = self.MARKS_PAREN_RE.sub('', text)
         
         # Remove "OR" dividers (but keep the question)
-        text = re.sub(r'\s+OR\s+', ' OR ', text)
+        text = self.OR_DIVIDER_RE.sub(' OR ', text)
         
         return text.strip()
     
-    def extract_questions_from_text(self, text: str) -> List[Dict[str, str]]:
-        """Extract all questions from text using multiple strategies"""
+    @staticmethod
+    def _cut_at_marker(marker, match, group: int):
+        """
+        Cut a match body at the next question marker.
+        
+        Stands in for the lookahead RE2 lacks. Returns the body and the
+        position to resume scanning from, so a marker later on the same
+        line still starts its own match.
+        """
+        body = match.group(group)
+        cut = marker.search(body, 1)
+        if cut is None:
+            return body, match.end()
+        return body[:cut.start()], match.start(group) + cut.start()
+    
+    def extract_questions_from_text(self, text: Union[str, Iterable[str]]) -> List[Dict[str, str]]:
+        """
+        Extract all questions from text using multiple strategies.
+        
+        Accepts a single string or an iterable of text chunks (e.g. PDF
+        pages). Chunks are scanned one at a time and de-duplicated together,
+        so the caller never has to join the whole document into one string.
+        The last question of a chunk may continue on the next one, so it is
+        carried over and scanned with the next chunk.
+        
+        Within a chunk, a candidate whose span lies inside an accepted single
+        question (e.g. a command phrase inside a numbered question) is
+        dropped; across chunks, exact repeats are dropped.
+        """
+        chunks = [text] if isinstance(text, str) else text
         questions = []
         seen = set()
         
-        # Strategy 1: Pattern-based extraction
-        for pattern in self.compiled_patterns:
-            matches = pattern.finditer(text)
-            for match in matches:
-                question_text = match.group(0) if match.lastindex is None else match.group(1)
-                cleaned = self.clean_question(question_text)
-                
-                if self._is_valid_question(cleaned) and cleaned not in seen:
-                    questions.append({
+        strategies = (
+            self._extract_pattern_questions,   # Strategy 1: Pattern-based extraction
+            self._extract_numbered_questions,  # Strategy 2: Numbered list detection
+            self._extract_section_questions,   # Strategy 3: Section-based (structured papers)
+        )
+        
+        def scan(chunk: str):
+            # Spans of accepted single questions in this chunk, sorted by
+            # start with none nested in another (so ends are sorted too)
+            starts, ends = [], []
+            for strategy in strategies:
+                for (start, end), q, single in strategy(chunk):
+                    if q['text'] in seen or self._span_covered(starts, ends, start, end):
+                        continue
+                    questions.append(q)
+                    seen.add(q['text'])
+                    if single:
+                        self._add_span(starts, ends, start, end)
+        
+        carry = ""
+        for chunk in chunks:
+            if carry:
+                # A continuation joins the carried question's line (the
+                # single-line patterns don't cross newlines); a chunk that
+                # opens with a new question keeps it at a line start
+                sep = "\n" if self.QUESTION_START_RE.match(chunk.lstrip()) else " "
+                text = f"{carry}{sep}{chunk}"
+            else:
+                text = chunk
+            cut = self._open_question_start(text)
+            scan(text[:cut])
+            carry = text[cut:]
+        if carry:
+            scan(carry)
+        
+        return questions
+    
+    def _open_question_start(self, text: str) -> int:
+        """
+        Start of the question that is still open at the end of text (the
+        last question start), or len(text) if none could continue past it.
+        """
+        last = None
+        for last in self.QUESTION_START_RE.finditer(text):
+            pass
+        # Longer than any valid question: nothing worth carrying over
+        if last is None or len(text) - last.start() > self.MAX_QUESTION_CHARS:
+            return len(text)
+        return last.start()
+    
+    @staticmethod
+    def _span_covered(starts: List[int], ends: List[int], start: int, end: int) -> bool:
+        """True if [start, end) lies inside an accepted span"""
+        i = bisect_right(starts, start) - 1
+        return i >= 0 and ends[i] >= end
+    
+    @staticmethod
+    def _add_span(starts: List[int], ends: List[int], start: int, end: int):
+        """Record an uncovered span, dropping accepted spans it now covers"""
+        i = bisect_right(starts, start)
+        if i > 0 and starts[i - 1] == start:
+            i -= 1
+        j = i
+        while j < len(starts) and ends[j] <= end:
+            j += 1
+        starts[i:j] = [start]
+        ends[i:j] = [end]
+    
+    # Strategies yield ((start, end), question, single) triples; the span is
+    # where the question body sits in the scanned text and is only used for
+    # dedup. Only single questions (bounded by question markers or numbers)
+    # hide the candidates nested in them: a free-form match such as an OR
+    # question can run across several questions.
+    
+    def _extract_pattern_questions(self, text: str) -> Iterator[Tuple[Tuple[int, int], Dict[str, str], bool]]:
+        """Extract questions matching QUESTION_PATTERNS (one fused pass) and FREE_FORM_PATTERNS"""
+        pos = 0
+        while True:
+            match = self.combined_pattern.search(text, pos)
+            if match is None:
+                break
+            
+            group = self._body_groups[match.lastgroup]
+            if match.lastgroup == "g0":
+                question_text, pos = self._cut_at_marker(self.QUESTION_MARKER, match, group)
+            else:
+                question_text, pos = match.group(group), match.end()
+            
+            cleaned = self.clean_question(question_text)
+            
+            if self._is_valid_question(cleaned):
+                start = match.start(group)
+                # g0/g1: "Q<n>" and numbered questions
+                single = match.lastgroup in ("g0", "g1")
+                yield ((start, start + len(question_text)), {
+                    'text': cleaned,
+                    'method': 'pattern',
+                    'confidence': 'high'
+                }, single)
+        
+        for pattern in self.free_form_patterns:
+            for match in pattern.finditer(text):
+                cleaned = self.clean_question(match.group(0))
+                if self._is_valid_question(cleaned):
+                    yield (match.span(), {
                         'text': cleaned,
                         'method': 'pattern',
                         'confidence': 'high'
-                    })
-                    seen.add(cleaned)
-        
-        # Strategy 2: Numbered list detection
-        numbered_questions = self._extract_numbered_questions(text)
-        for q in numbered_questions:
-            if q['text'] not in seen:
-                questions.append(q)
-                seen.add(q['text'])
-        
-        # Strategy 3: Section-based extraction (for structured papers)
-        section_questions = self._extract_section_questions(text)
-        for q in section_questions:
-            if q['text'] not in seen:
-                questions.append(q)
-                seen.add(q['text'])
-        
-        return questions
+                    }, False)
     
-    def _extract_numbered_questions(self, text: str) -> List[Dict[str, str]]:
+    def _extract_numbered_questions(self, text: str) -> Iterator[Tuple[Tuple[int, int], Dict[str, str], bool]]:
         """Extract questions from numbered lists (1. 2. 3. etc.)"""
-        questions = []
-        lines = text.split('\n')
-        current_question = ""
-        question_number = None
-        
-        for line in lines:
-            # Check if line starts with a number
-            match = re.match(r'^\s*(\d+)[\.\)]\s*(.+)', line)
-            if match:
-                # Save previous question if exists
-                if current_question:
-                    cleaned = self.clean_question(current_question)
-                    if self._is_valid_question(cleaned):
-                        questions.append({
-                            'text': cleaned,
-                            'number': question_number,
-                            'method': 'numbered',
-                            'confidence': 'high'
-                        })
-                
-                # Start new question
-                question_number = match.group(1)
-                current_question = match.group(2)
-            elif current_question:
-                # Continue current question
-                current_question += " " + line.strip()
-        
-        # Don't forget the last question
-        if current_question:
-            cleaned = self.clean_question(current_question)
+        # Each numbered line starts a question that runs up to the next one
+        headers = list(self.numbered_pattern.finditer(text))
+        for i, match in enumerate(headers):
+            end = headers[i + 1].start() if i + 1 < len(headers) else len(text)
+            cleaned = self.clean_question(text[match.start(2):end])
             if self._is_valid_question(cleaned):
-                questions.append({
+                yield ((match.start(2), end), {
                     'text': cleaned,
-                    'number': question_number,
+                    'number': match.group(1),
                     'method': 'numbered',
                     'confidence': 'high'
-                })
-        
-        return questions
+                }, True)
     
-    def _extract_section_questions(self, text: str) -> List[Dict[str, str]]:
+    def _extract_section_questions(self, text: str) -> Iterator[Tuple[Tuple[int, int], Dict[str, str], bool]]:
         """Extract questions from section-based papers (Section A, B, C, etc.)"""
-        questions = []
+        # No "Q."/"Question n" marker anywhere means no section questions
+        # either, so skip the heading scan (numbered-style papers)
+        if self.section_question_pattern.search(text) is None:
+            return
         
-        # Split by sections
-        section_pattern = r'(?:SECTION|Section|PART|Part)\s+[A-Z]'
-        sections = re.split(section_pattern, text, flags=re.IGNORECASE)
+        # Sections are the stretches between headings; scanning them in place
+        # (pos/endpos) keeps spans in whole-text coordinates
+        bounds = []
+        section_start = 0
+        for heading in self.section_split_pattern.finditer(text):
+            bounds.append((section_start, heading.start()))
+            section_start = heading.end()
+        bounds.append((section_start, len(text)))
         
-        for section in sections:
+        for pos, section_end in bounds:
             # Look for question markers within section
-            q_pattern = r'(?:Q\.|Question)\s*\d+[:\.\)]?\s*(.+?)(?=(?:Q\.|Question)\s*\d+|$)'
-            matches = re.finditer(q_pattern, section, re.MULTILINE | re.DOTALL)
-            
-            for match in matches:
-                question_text = match.group(1)
+            while True:
+                match = self.section_question_pattern.search(text, pos, section_end)
+                if match is None:
+                    break
+                
+                question_text, pos = self._cut_at_marker(self.SECTION_QUESTION_MARKER, match, 1)
                 cleaned = self.clean_question(question_text)
                 
                 if self._is_valid_question(cleaned):
-                    questions.append({
+                    start = match.start(1)
+                    yield ((start, start + len(question_text)), {
                         'text': cleaned,
                         'method': 'section',
                         'confidence': 'medium'
-                    })
-        
-        return questions
+                    }, True)
+    
+    MAX_QUESTION_CHARS = 1000
     
     def _is_valid_question(self, text: str) -> bool:
         """Validate if extracted text is likely a question"""
-        if not text or len(text) < 20:
-            return False
-        
-        if len(text) > 1000:  # Too long, probably not a single question
-            return False
-        
-        # Must have some alphabetic content
-        if not re.search(r'[a-zA-Z]{3,}', text):
+        # Too short, or too long to be a single question
+        if not 20 <= len(text) <= self.MAX_QUESTION_CHARS:
             return False
         
-        # Exclude common non-question content
-        exclude_patterns = [
-            r'^(?:Page|Figure|Table|Diagram|Image)\s+\d+',
-            r'^(?:Time|Duration|Total Marks):',
-            r'^(?:Instructions?|Note|Guidelines?):',
-            r'^(?:UNIVERSITY|COLLEGE|DEPARTMENT)',
-        ]
-        
-        for pattern in exclude_patterns:
-            if re.match(pattern, text, re.IGNORECASE):
-                return False
-        
-        return True
+        # Must have some alphabetic content, and not be common non-question content
+        return bool(self.ALPHA_RE.search(text)) and not self.EXCLUDE_RE.match(text)
 
 
 class UniversalAutoSolver:
     """Universal solver for any question paper"""
     
+    # Metadata patterns
+    YEAR_RE = re.compile(r'\b(20\d{2}|19\d{2})\b')
+    SEMESTER_RE = re.compile(r'(?:Semester|Sem|Term)\s*[:-]?\s*(\d+|[IVX]+)', re.IGNORECASE)
+    COURSE_CODE_RE = re.compile(r'\b([A-Z]{2,4}\s*\d{3,4})\b')
+    
+    # Searched one field at a time: in a fused alternation one field's match
+    # can hide another's (e.g. "DEC 2023" reads as a course code)
+    METADATA_FIELDS = (('year', YEAR_RE), ('semester', SEMESTER_RE), ('course_code', COURSE_CODE_RE))
+    
+    # Bump when extraction/detection logic changes so cached analyses of
+    # unchanged PDFs are recomputed
+    ANALYSIS_CACHE_VERSION = 4
+    
     def __init__(self, data_dir: str = None):
+        # Imported here so batch-analysis worker processes, which re-import
+        # this module, don't pay for loading the RAG/LLM stack
+        from main import AthenaApp
+        
         self.data_dir = paths.data_dir
         self.app = AthenaApp(data_dir)
         self.extractor = UniversalQuestionExtractor()
-        self.use_cloud = USE_CLOUD_DEFAULT
-        
+        self.use_cloud = get_config().use_cloud_by_default
+        
+        # Shared across papers so batch runs stay under the provider's RPM;
+        # built on first cloud use (see _get_cloud_limiter)
+        self._cloud_limiter = None
+        self._answer_cache = AnswerCache()
+        
+    def _model_id(self) -> str:
+        """Name of the model answering in the current mode (part of the cache key)"""
+        config = get_config()
+        if self.use_cloud:
+            return config.cloud_model
+        if config.local_model_engine.lower() == "ollama":
+            return f"ollama:{config.ollama_model}"
+        return f"{config.local_model_engine}:{config.local_model_path}"
+    
+    def _get_cloud_limiter(self) -> Optional[TokenBucket]:
+        """The shared cloud rate limiter, or None when cloud_rpm is unset or not positive"""
+        if self._cloud_limiter is None:
+            config = get_config()
+            rpm = config.cloud_rpm
+            if isinstance(rpm, (int, float)) and rpm > 0:
+                self._cloud_limiter = TokenBucket(rpm, burst=config.cloud_concurrency or 1)
+        return self._cloud_limiter
+    
+    def close(self):
+        """Release the answer cache's database connection"""
+        self._answer_cache.close()
+    
     def set_cloud_mode(self, use_cloud: bool):
         """Toggle between local and cloud LLM"""
         self.use_cloud = use_cloud
         mode = "CLOUD ☁️" if use_cloud else "LOCAL 💻"
         print(f"Solver mode: {mode}")
     
+    def _ensure_rag(self) -> bool:
+        """Initialize the app's RAG/query service unless it is already up"""
+        if self.app.query_service is not None:
+            return True
+        return self.app.initialize_rag()
+    
     def analyze_question_paper(self, pdf_path: str) -> Dict:
         """Analyze a question paper and extract metadata"""
         print(f"\n📄 Analyzing: {os.path.basename(pdf_path)}")
-        
-        # Initialize RAG if needed
-        if not self.app.rag:
-            self.app.initialize_rag()
+        return self.analyze_pdf(pdf_path, self.extractor)
+    
+    @classmethod
+    def analyze_pdf(cls, pdf_path: str, extractor: UniversalQuestionExtractor,
+                    workers: Optional[int] = None) -> Dict:
+        """
+        Extract text from a question paper and analyze it.
+        
+        Pure CPU work with no RAG or LLM involved, so it can run in a
+        worker process (see batch_solve_directory). ``workers`` caps the
+        processes used for page extraction; None uses every core.
+        
+        Results are cached on disk keyed by the PDF's content hash, so
+        re-running on the same paper skips extraction entirely.
+        """
+        cache_file = paths.get_cache_file(f"analysis_{cls._cache_key(pdf_path)}.json")
+        if cache_file.exists():
+            try:
+                analysis = json.loads(cache_file.read_text(encoding="utf-8"))
+                # Same content may live under a different path/name
+                analysis['file'] = pdf_path
+                analysis['filename'] = os.path.basename(pdf_path)
+                analysis['metadata'] = cls._extract_metadata(analysis['filename'], analysis['preview'])
+                logger.debug(f"Analysis cache hit for {pdf_path}")
+                return analysis
+            except Exception as e:
+                logger.warning(f"Ignoring unreadable analysis cache {cache_file}: {e}")
         
         # Extract text from PDF
         from pdf_processor import PDFProcessor
         processor = PDFProcessor()
-        pages = processor.extract_text_from_pdf(pdf_path)
+        pages = processor.extract_text_parallel(pdf_path, workers=workers)
         
         if not pages:
             return {'error': 'Failed to extract text from PDF'}
         
-        # Combine all page text
-        full_text = "\n".join([p['text'] for p in pages])
+        # Scan page by page rather than joining the whole PDF into one string
+        page_texts = [p['text'] for p in pages]
+        head = cls._leading_text(page_texts, 500)
         
         # Extract questions
-        questions = self.extractor.extract_questions_from_text(full_text)
+        questions = extractor.extract_questions_from_text(page_texts)
         
         # Detect subject
-        subject = self.extractor.detect_subject(full_text)
+        subject = extractor.detect_subject(page_texts)
         
         # Extract metadata from filename and content
         filename = os.path.basename(pdf_path)
-        metadata = self._extract_metadata(filename, full_text)
+        metadata = cls._extract_metadata(filename, head)
         
         analysis = {
             'file': pdf_path,
@@ -272,43 +528,69 @@ class UniversalAutoSolver:
             'questions': questions,
             'detected_subject': subject,
             'metadata': metadata,
-            'preview': full_text[:500]
+            'preview': head
         }
         
+        # Batch workers may analyze identical papers at once: write to a
+        # private temp file and rename, so readers never see a torn entry
+        tmp_file = cache_file.with_name(f"{cache_file.name}.{os.getpid()}.tmp")
+        try:
+            tmp_file.write_text(json.dumps(analysis, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp_file, cache_file)
+        except Exception as e:
+            tmp_file.unlink(missing_ok=True)
+            logger.warning(f"Could not write analysis cache {cache_file}: {e}")
+        
         return analysis
     
-    def _extract_metadata(self, filename: str, text: str) -> Dict:
+    @classmethod
+    def _cache_key(cls, pdf_path: str) -> str:
+        """Content hash of a PDF (plus cache version), read in 1MB blocks"""
+        h = hashlib.blake2b(digest_size=16)
+        h.update(str(cls.ANALYSIS_CACHE_VERSION).encode())
+        with open(pdf_path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                h.update(block)
+        return h.hexdigest()
+    
+    @staticmethod
+    def _leading_text(page_texts: List[str], limit: int) -> str:
+        """First ``limit`` characters of the pages as if joined by newlines"""
+        parts = []
+        size = 0
+        for text in page_texts:
+            parts.append(text)
+            size += len(text) + 1
+            if size >= limit:
+                break
+        return "\n".join(parts)[:limit]
+    
+    @classmethod
+    def _extract_metadata(cls, filename: str, text: str) -> Dict:
         """Extract metadata like year, semester, course from filename and content"""
-        metadata = {}
-        
-        # Extract year
-        year_match = re.search(r'\b(20\d{2}|19\d{2})\b', filename + " " + text[:500])
-        if year_match:
-            metadata['year'] = year_match.group(1)
-        
-        # Extract semester/term
-        sem_match = re.search(r'(?:Semester|Sem|Term)\s*[:-]?\s*(\d+|[IVX]+)', 
-                             filename + " " + text[:500], re.IGNORECASE)
-        if sem_match:
-            metadata['semester'] = sem_match.group(1)
+        haystack = filename + " " + text[:500]
         
-        # Extract course code
-        code_match = re.search(r'\b([A-Z]{2,4}\s*\d{3,4})\b', filename + " " + text[:500])
-        if code_match:
-            metadata['course_code'] = code_match.group(1)
+        # First year, semester/term and course code
+        metadata = {}
+        for key, pattern in cls.METADATA_FIELDS:
+            match = pattern.search(haystack)
+            if match:
+                metadata[key] = match.group(1)
         
         return metadata
     
     def solve_question_paper(self, pdf_path: str, output_file: Optional[str] = None,
                            subject_filter: Optional[str] = None,
-                           module_filter: Optional[str] = None):
-        """Solve all questions in a question paper"""
+                           module_filter: Optional[str] = None,
+                           analysis: Optional[Dict] = None):
+        """Solve all questions in a question paper (optionally from a precomputed analysis)"""
         print("\n" + "="*80)
         print("🎯 UNIVERSAL QUESTION PAPER SOLVER")
         print("="*80)
         
         # Analyze the paper
-        analysis = self.analyze_question_paper(pdf_path)
+        if analysis is None:
+            analysis = self.analyze_question_paper(pdf_path)
         
         if 'error' in analysis:
             print(f"❌ Error: {analysis['error']}")
@@ -344,96 +626,173 @@ class UniversalAutoSolver:
         if not output_file:
             base_name = os.path.splitext(analysis['filename'])[0]
             output_file = f"{base_name}_solutions.txt"
+        # Machine-readable copy of the answers, one JSON object per line
+        records_file = os.path.splitext(output_file)[0] + ".jsonl"
         
-        # Initialize RAG
-        if not self.app.initialize_rag():
+        # Initialize RAG (once per solver, not once per paper)
+        if not self._ensure_rag():
             print("❌ Failed to initialize RAG")
             return
         
         # Solve questions
         print(f"\n🚀 Starting to solve questions...")
         print(f"   Mode: {'☁️  CLOUD' if self.use_cloud else '💻 LOCAL'}")
-        print(f"   Output: {output_file}\n")
-        
-        self._write_header(output_file, analysis)
+        print(f"   Output: {output_file} (+ {os.path.basename(records_file)})\n")
         
         solved = 0
         failed = 0
         
-        for i, q_data in enumerate(questions, 1):
-            question = q_data['text']
-            print(f"\n[{i}/{len(questions)}] Solving...")
-            print(f"Q: {question[:100]}{'...' if len(question) > 100 else ''}")
+        subject = subject_filter or analysis.get('detected_subject')
+        mode = 'cloud' if self.use_cloud else 'local'
+        model = self._model_id()
+        limiter = self._get_cloud_limiter() if self.use_cloud else None
+        # Cached answers are only valid for the knowledge base they came from
+        fingerprint = self.app.rag.get_index_fingerprint()
+        cache = self._answer_cache if fingerprint is not None else None
+        
+        def answer_question(question: str) -> str:
+            if cache is not None:
+                key = answer_key(question, mode, model, subject, module_filter, fingerprint)
+                cached = cache.get(key)
+                if cached is not None:
+                    return cached
             
-            try:
-                # Get answer
-                answer = self.app.auto_answer_question(
-                    question,
-                    subject_filter=subject_filter or analysis.get('detected_subject'),
-                    module_filter=module_filter,
-                    use_cloud=self.use_cloud
-                )
-                
-                # Save answer
-                self._save_answer(output_file, i, question, answer, q_data)
-                
-                print(f"✅ Solved")
-                solved += 1
-                
-                # Rate limiting
-                time.sleep(1 if self.use_cloud else 0.5)
-                
-            except Exception as e:
-                logger.exception(f"Error solving question {i}")
-                self._save_answer(output_file, i, question, f"❌ ERROR: {str(e)}", q_data)
-                print(f"❌ Failed: {str(e)}")
-                failed += 1
-        
-        # Summary
-        print("\n" + "="*80)
-        print("📊 SUMMARY")
-        print("="*80)
-        print(f"   ✅ Solved: {solved}")
-        print(f"   ❌ Failed: {failed}")
-        print(f"   📄 Output: {output_file}")
-        print("="*80 + "\n")
-    
-    def _write_header(self, output_file: str, analysis: Dict):
-        """Write header section to output file"""
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write("="*80 + "\n")
-            f.write("AUTOMATED SOLUTION SHEET\n")
-            f.write("Generated by Athena Universal Auto-Solver\n")
-            f.write("="*80 + "\n\n")
-            f.write(f"Question Paper: {analysis['filename']}\n")
-            f.write(f"Total Questions: {analysis['total_questions']}\n")
-            f.write(f"Detected Subject: {analysis.get('detected_subject', 'Unknown')}\n")
-            
-            if analysis.get('metadata'):
-                f.write(f"Metadata: {analysis['metadata']}\n")
+            # Rate limiting (cloud only; local calls are already sequential)
+            if limiter is not None:
+                limiter.acquire()
             
-            f.write(f"Solved using: {'Cloud LLM' if self.use_cloud else 'Local LLM'}\n")
-            f.write(f"Generated on: {time.strftime('%Y-%m-%d %H:%M:%S')}\n")
-            f.write("\n" + "="*80 + "\n\n")
-    
-    def _save_answer(self, output_file: str, q_num: int, question: str, 
-                    answer: str, q_data: Dict):
-        """Save individual answer to file"""
-        with open(output_file, 'a', encoding='utf-8') as f:
-            f.write("\n" + "="*80 + "\n")
-            f.write(f"QUESTION {q_num}\n")
+            answer = self.app.auto_answer_question(
+                question,
+                subject_filter=subject,
+                module_filter=module_filter,
+                use_cloud=self.use_cloud
+            )
             
-            if q_data.get('number'):
-                f.write(f"Original Number: {q_data['number']}\n")
+            # Don't pin "no results"/error answers; the index may improve
+            if cache is not None and not answer.startswith("❌"):
+                cache.put(key, answer)
+            return answer
+        
+        # Cloud calls are network-bound, so keep several in flight; local
+        # generation is compute-bound and stays one at a time. Answers are
+        # still written in question order.
+        workers = get_config().cloud_concurrency if self.use_cloud else 1
+        # Progress goes out as one write per step (not a print per line),
+        # flushed so it shows while the next answer is being generated
+        out = sys.stdout
+        with open(output_file, 'w', encoding='utf-8', buffering=1 << 16) as fh, \
+                open(records_file, 'wb', buffering=1 << 16) as records_fh, \
+                ThreadPoolExecutor(max_workers=workers) as pool:
+            self._write_header(fh, analysis)
+            futures = [pool.submit(answer_question, q_data['text']) for q_data in questions]
             
-            f.write(f"Extraction Method: {q_data.get('method', 'unknown')}\n")
-            f.write(f"Confidence: {q_data.get('confidence', 'unknown')}\n")
-            f.write("-"*80 + "\n")
-            f.write(f"{question}\n")
-            f.write("-"*80 + "\n")
-            f.write("ANSWER:\n\n")
-            f.write(f"{answer}\n")
-            f.write("="*80 + "\n")
+            for i, (q_data, future) in enumerate(zip(questions, futures), 1):
+                question = q_data['text']
+                out.write(f"\n[{i}/{len(questions)}] Solving...\n"
+                          f"Q: {question[:100]}{'...' if len(question) > 100 else ''}\n")
+                out.flush()
+                
+                try:
+                    # Get answer
+                    answer = future.result()
+                    
+                    # Save answer
+                    self._save_answer(fh, i, question, answer, q_data, records_fh)
+                    
+                    out.write("✅ Solved\n")
+                    solved += 1
+                    
+                except Exception as e:
+                    logger.exception(f"Error solving question {i}")
+                    self._save_answer(fh, i, question, f"❌ ERROR: {str(e)}", q_data, records_fh)
+                    out.write(f"❌ Failed: {str(e)}\n")
+                    failed += 1
+                out.flush()
+        
+        # Summary
+        out.write("\n".join([
+            "",
+            BANNER,
+            "📊 SUMMARY",
+            BANNER,
+            f"   ✅ Solved: {solved}",
+            f"   ❌ Failed: {failed}",
+            f"   📄 Output: {output_file}",
+            BANNER + "\n\n",
+        ]))
+        out.flush()
+    
+    def _write_header(self, fh, analysis: Dict):
+        """Write header section to an open output file"""
+        parts = [
+            "="*80 + "\n",
+            "AUTOMATED SOLUTION SHEET\n",
+            "Generated by Athena Universal Auto-Solver\n",
+            "="*80 + "\n\n",
+            f"Question Paper: {analysis['filename']}\n",
+            f"Total Questions: {analysis['total_questions']}\n",
+            f"Detected Subject: {analysis.get('detected_subject', 'Unknown')}\n",
+        ]
+        
+        if analysis.get('metadata'):
+            parts.append(f"Metadata: {analysis['metadata']}\n")
+        
+        parts += [
+            f"Solved using: {'Cloud LLM' if self.use_cloud else 'Local LLM'}\n",
+            f"Generated on: {time.strftime('%Y-%m-%d %H:%M:%S')}\n",
+            "\n" + "="*80 + "\n\n",
+        ]
+        fh.writelines(parts)
+    
+    def _save_answer(self, fh, q_num: int, question: str, 
+                    answer: str, q_data: Dict, records_fh=None):
+        """Append individual answer to an open output file (and JSONL record file)"""
+        parts = ["\n" + "="*80 + "\n", f"QUESTION {q_num}\n"]
+        
+        if q_data.get('number'):
+            parts.append(f"Original Number: {q_data['number']}\n")
+        
+        parts += [
+            f"Extraction Method: {q_data.get('method', 'unknown')}\n",
+            f"Confidence: {q_data.get('confidence', 'unknown')}\n",
+            "-"*80 + "\n",
+            f"{question}\n",
+            "-"*80 + "\n",
+            "ANSWER:\n\n",
+            f"{answer}\n",
+            "="*80 + "\n",
+        ]
+        fh.writelines(parts)
+        
+        if records_fh is not None:
+            records_fh.write(_json_line({
+                "q": q_num,
+                "number": q_data.get('number'),
+                "mode": "cloud" if self.use_cloud else "local",
+                "method": q_data.get('method'),
+                "question": question,
+                "answer": answer,
+            }))
+    
+    @classmethod
+    def _iter_pdf_paths(cls, directory: str):
+        """Yield PDF paths under ``directory`` in os.walk (top-down) order"""
+        subdirs = []
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    # DirEntry caches the file type from the directory read,
+                    # so this needs no extra stat() per entry on most platforms
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    elif entry.name.lower().endswith('.pdf'):
+                        yield entry.path
+        except OSError as e:
+            logger.warning(f"Skipping unreadable directory {directory}: {e}")
+            return
+        
+        for subdir in subdirs:
+            yield from cls._iter_pdf_paths(subdir)
     
     def batch_solve_directory(self, directory: str = None):
         """Solve all question papers in a directory"""
@@ -445,11 +804,7 @@ class UniversalAutoSolver:
             return
         
         # Find all PDFs
-        pdf_files = []
-        for root, _, files in os.walk(directory):
-            for file in files:
-                if file.lower().endswith('.pdf'):
-                    pdf_files.append(os.path.join(root, file))
+        pdf_files = list(self._iter_pdf_paths(directory))
         
         if not pdf_files:
             print(f"❌ No PDF files found in {directory}")
@@ -465,20 +820,42 @@ class UniversalAutoSolver:
             print("Cancelled.")
             return
         
-        # Solve each paper
-        for i, pdf_path in enumerate(pdf_files, 1):
+        # Analyze all papers in parallel: PDF parsing and question scanning
+        # are CPU-bound and independent per file
+        print(f"\n🔎 Analyzing {len(pdf_files)} papers...")
+        workers = min(len(pdf_files), os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            analyses = list(pool.map(_analyze_only, pdf_files))
+        
+        # Solve each paper (LLM calls stay in this process)
+        for i, (pdf_path, analysis) in enumerate(zip(pdf_files, analyses), 1):
             print(f"\n{'='*80}")
             print(f"Processing {i}/{len(pdf_files)}")
             print(f"{'='*80}")
             
             try:
-                self.solve_question_paper(pdf_path)
+                self.solve_question_paper(pdf_path, analysis=analysis)
             except Exception as e:
                 logger.exception(f"Failed to process {pdf_path}")
                 print(f"❌ Failed: {str(e)}")
-            
-            if i < len(pdf_files):
-                time.sleep(2)  # Brief pause between papers
+
+
+# Per-process extractor for batch analysis workers
+_worker_extractor: Optional[UniversalQuestionExtractor] = None
+
+
+def _analyze_only(pdf_path: str) -> Dict:
+    """Process-pool worker: analyze one paper without touching RAG or LLMs"""
+    global _worker_extractor
+    if _worker_extractor is None:
+        _worker_extractor = UniversalQuestionExtractor()
+    
+    try:
+        # Papers are already spread across processes; don't fan out again
+        return UniversalAutoSolver.analyze_pdf(pdf_path, _worker_extractor, workers=1)
+    except Exception as e:
+        logger.exception(f"Failed to analyze {pdf_path}")
+        return {'error': str(e)}
 
 
 def main():
@@ -489,7 +866,14 @@ def main():
     print("It automatically detects questions and provides detailed answers.\n")
     
     solver = UniversalAutoSolver()
-    
+    try:
+        _run_menu(solver)
+    finally:
+        solver.close()
+
+
+def _run_menu(solver: UniversalAutoSolver):
+    """Show the knowledge base summary, then the options menu"""
     # Check for indexed documents
     pdfs = get_pdf_files_recursive(solver.data_dir)
     if pdfs:
@@ -504,35 +888,38 @@ def main():
         print("⚠️  No documents in knowledge base.")
         print("   Add reference materials to ./data/ for better answers.")
     
-    print("\n" + "-"*80)
-    print("OPTIONS:")
-    print("  1. Solve a single question paper")
-    print("  2. Batch solve all papers in a directory")
-    print("  3. Change LLM mode (current: {})".format("CLOUD ☁️" if solver.use_cloud else "LOCAL 💻"))
-    print("-"*80)
-    
-    choice = input("\nSelect option (1-3): ").strip()
-    
-    if choice == '1':
-        pdf_path = input("\nEnter path to question paper PDF: ").strip()
-        if os.path.exists(pdf_path):
-            solver.solve_question_paper(pdf_path)
+    while True:
+        print("\n" + "-"*80)
+        print("OPTIONS:")
+        print("  1. Solve a single question paper")
+        print("  2. Batch solve all papers in a directory")
+        print("  3. Change LLM mode (current: {})".format("CLOUD ☁️" if solver.use_cloud else "LOCAL 💻"))
+        print("-"*80)
+        
+        choice = input("\nSelect option (1-3): ").strip()
+        
+        if choice == '1':
+            pdf_path = input("\nEnter path to question paper PDF: ").strip()
+            if os.path.exists(pdf_path):
+                solver.solve_question_paper(pdf_path)
+            else:
+                print(f"❌ File not found: {pdf_path}")
+        
+        elif choice == '2':
+            solver.batch_solve_directory()
+        
+        elif choice == '3':
+            mode = input("Use CLOUD (c) or LOCAL (l)? ").strip().lower()
+            solver.set_cloud_mode(mode == 'c')
+            # Re-show the menu with the same solver so the new mode (and the
+            # already-loaded models) carry over
+            print("\nReturning to main menu...")
+            continue
+        
         else:
-            print(f"❌ File not found: {pdf_path}")
-    
-    elif choice == '2':
-        solver.batch_solve_directory()
-    
-    elif choice == '3':
-        mode = input("Use CLOUD (c) or LOCAL (l)? ").strip().lower()
-        solver.set_cloud_mode(mode == 'c')
-        print("\nReturning to main menu...")
-        time.sleep(1)
-        main()  # Restart menu
-    
-    else:
-        print("Invalid choice.")
-
+            print("Invalid choice.")
+        
+        break
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -6,7 +6,9 @@ Loads config.json once and provides type-safe access to all settings.
 """
 import json
 import os
+from collections.abc import Mapping
 from pathlib import Path
+from types import MappingProxyType
 from typing import Any, Optional
 import logging
 
@@ -15,12 +17,31 @@ from . import paths
 
 logger = logging.getLogger(__name__)
 
+try:
+    import orjson
+except Exception:
+    orjson = None
+
 
 class ConfigManager:
     """Singleton configuration manager"""
 
     _instance: Optional['ConfigManager'] = None
-    _config: dict = {}
+
+    __slots__ = (
+        '_config',
+        'default_search_results', 'semantic_weight', 'chunk_size', 'chunk_overlap',
+        'embedding_model', 'embedding_backend', 'embedding_onnx_file',
+        'embed_batch_size', 'use_cloud_by_default',
+        'llm_timeout_seconds', 'max_tokens', 'n_ctx', 'temperature',
+        'local_model_engine', 'ollama_model', 'local_model_path', 'local_prompt_cache',
+        'local_prompt_cache_path', 'cloud_model',
+        'cloud_concurrency', 'cloud_rpm', 'llm_concurrency', 'llm_response_cache',
+        'max_chunk_chars_cloud', 'max_chunks_cloud',
+        'remove_pii', 'chroma_persist_dir', 'enable_bm25', 'reload_on_start',
+        'server_host', 'server_port', 'server_debug', 'server_threads', 'api_key_for_admin',
+        'cache_hot_entries', 'warmup_questions_path', 'show_sources_on_answer', 'data_dir', 'cache_dir', 'logs_dir',
+    )
 
     def __init__(self):
         if ConfigManager._instance is not None:
@@ -41,10 +62,16 @@ class ConfigManager:
                 logger.warning(f"Config file not found: {paths.CONFIG_FILE}")
                 logger.warning("Using default configuration values")
                 self._config = {}
+                self._freeze()
                 return
 
-            with open(paths.CONFIG_FILE, 'r', encoding='utf-8') as f:
-                self._config = json.load(f)
+            if orjson is not None:
+                # orjson.JSONDecodeError subclasses json.JSONDecodeError
+                self._config = orjson.loads(paths.CONFIG_FILE.read_bytes())
+            else:
+                with open(paths.CONFIG_FILE, 'r', encoding='utf-8') as f:
+                    self._config = json.load(f)
+            self._freeze()
 
             logger.info(f"✅ Configuration loaded from {paths.CONFIG_FILE}")
             self._validate_config()
@@ -71,138 +98,90 @@ class ConfigManager:
         keys = key.split('.')
         value = self._config
         for k in keys:
-            if isinstance(value, dict):
+            if isinstance(value, Mapping):
                 value = value.get(k)
             else:
                 return default
         return value if value is not None else default
 
-    # === Search Configuration ===
-    @property
-    def default_search_results(self) -> int:
-        return self.get('default_search_results', manager.DEFAULT_SEARCH_RESULTS)
-
-    @property
-    def semantic_weight(self) -> float:
-        return self.get('semantic_weight', manager.DEFAULT_SEMANTIC_WEIGHT)
-
-    # === PDF Processing ===
-    @property
-    def chunk_size(self) -> int:
-        return self.get('chunk_size', manager.DEFAULT_CHUNK_SIZE)
-
-    @property
-    def chunk_overlap(self) -> int:
-        return self.get('chunk_overlap', manager.DEFAULT_CHUNK_OVERLAP)
-
-    # === Embedding ===
-    @property
-    def embedding_model(self) -> str:
-        return self.get('embedding_model', manager.DEFAULT_EMBEDDING_MODEL)
-
-    @property
-    def embed_batch_size(self) -> int:
-        return self.get('embed_batch_size', manager.DEFAULT_EMBED_BATCH_SIZE)
-
-    # === LLM Configuration ===
-    @property
-    def use_cloud_by_default(self) -> bool:
-        return self.get('use_cloud_by_default', manager.DEFAULT_USE_CLOUD)
-
-    @property
-    def llm_timeout_seconds(self) -> int:
-        return self.get('llm_timeout_seconds', manager.DEFAULT_LLM_TIMEOUT)
-
-    @property
-    def max_tokens(self) -> int:
-        return self.get('local_model.max_tokens', manager.DEFAULT_MAX_TOKENS)
-
-    @property
-    def n_ctx(self) -> int:
-        return self.get('local_model.n_ctx', manager.DEFAULT_N_CTX)
-
-    @property
-    def temperature(self) -> float:
-        return self.get('local_model.temperature', manager.DEFAULT_TEMPERATURE)
-
-    @property
-    def local_model_engine(self) -> str:
-        return self.get('local_model.default_engine', 'ollama')
-
-    @property
-    def ollama_model(self) -> str:
-        return self.get('local_model.ollama_model', 'mistral')
-
-    @property
-    def local_model_path(self) -> Optional[str]:
-        return self.get('local_model.model_path') or self.get('local_model.local_model_path')
-
-    @property
-    def cloud_model(self) -> str:
-        return self.get('cloud_model', 'gemini-1.5-pro')
-
-    # === Cloud Sanitization ===
-    @property
-    def max_chunk_chars_cloud(self) -> int:
-        return self.get('sanitization.max_chunk_chars_sent_to_cloud',
-                        manager.DEFAULT_MAX_CHUNK_CHARS_CLOUD)
-
-    @property
-    def max_chunks_cloud(self) -> int:
-        return self.get('sanitization.max_chunks_sent_to_cloud',
-                        manager.DEFAULT_MAX_CHUNKS_CLOUD)
-
-    @property
-    def remove_pii(self) -> bool:
-        return self.get('sanitization.remove_pii', True)
-
-    # === Database ===
-    @property
-    def chroma_persist_dir(self) -> str:
-        return self.get('chroma_persist_dir', str(paths.CHROMA_DB_DIR))
-
-    @property
-    def enable_bm25(self) -> bool:
-        return self.get('enable_bm25', manager.DEFAULT_ENABLE_BM25)
-
-    @property
-    def reload_on_start(self) -> bool:
-        return self.get('reload_on_start', manager.DEFAULT_RELOAD_ON_START)
-
-    # === Server Configuration ===
-    @property
-    def server_host(self) -> str:
-        return self.get('server.host', manager.DEFAULT_SERVER_HOST)
-
-    @property
-    def server_port(self) -> int:
-        return self.get('server.port', manager.DEFAULT_SERVER_PORT)
-
-    @property
-    def server_debug(self) -> bool:
-        return self.get('server.debug', manager.DEFAULT_SERVER_DEBUG)
-
-    @property
-    def api_key_for_admin(self) -> Optional[str]:
-        return self.get('server.api_key_for_admin') or os.getenv('ATHENA_ADMIN_KEY')
-
-    # === Feature Flags ===
-    @property
-    def show_sources_on_answer(self) -> bool:
-        return self.get('show_sources_on_answer', manager.DEFAULT_SHOW_SOURCES)
-
-    # === Paths (delegated to paths module) ===
-    @property
-    def data_dir(self) -> Path:
-        return paths.DATA_DIR
-
-    @property
-    def cache_dir(self) -> Path:
-        return paths.CACHE_DIR
-
-    @property
-    def logs_dir(self) -> Path:
-        return paths.LOGS_DIR
+    def _freeze(self):
+        """
+        Resolve every setting once into a plain attribute and make the raw
+        config read-only. Settings are read on hot paths (per query, per
+        LLM call), where an attribute load beats a property call plus a
+        dotted-key dict walk.
+        """
+        # === Search Configuration ===
+        self.default_search_results = self.get('default_search_results', manager.DEFAULT_SEARCH_RESULTS)
+        self.semantic_weight = self.get('semantic_weight', manager.DEFAULT_SEMANTIC_WEIGHT)
+
+        # === PDF Processing ===
+        self.chunk_size = self.get('chunk_size', manager.DEFAULT_CHUNK_SIZE)
+        self.chunk_overlap = self.get('chunk_overlap', manager.DEFAULT_CHUNK_OVERLAP)
+
+        # === Embedding ===
+        self.embedding_model = self.get('embedding_model', manager.DEFAULT_EMBEDDING_MODEL)
+        self.embedding_backend = self.get('embedding_backend', manager.DEFAULT_EMBEDDING_BACKEND)
+        self.embedding_onnx_file = self.get('embedding_onnx_file', manager.DEFAULT_EMBEDDING_ONNX_FILE)
+        self.embed_batch_size = self.get('embed_batch_size', manager.DEFAULT_EMBED_BATCH_SIZE)
+
+        # === LLM Configuration ===
+        self.use_cloud_by_default = self.get('use_cloud_by_default', manager.DEFAULT_USE_CLOUD)
+        self.llm_timeout_seconds = self.get('llm_timeout_seconds', manager.DEFAULT_LLM_TIMEOUT)
+        self.max_tokens = self.get('local_model.max_tokens', manager.DEFAULT_MAX_TOKENS)
+        self.n_ctx = self.get('local_model.n_ctx', manager.DEFAULT_N_CTX)
+        self.temperature = self.get('local_model.temperature', manager.DEFAULT_TEMPERATURE)
+        self.local_model_engine = self.get('local_model.default_engine', 'ollama')
+        self.ollama_model = self.get('local_model.ollama_model', 'mistral')
+        self.local_model_path = self.get('local_model.model_path') or self.get('local_model.local_model_path')
+        # llama-cpp prompt-prefix KV cache (opt-in until benchmarked)
+        self.local_prompt_cache = self.get('local_model.prompt_cache', manager.DEFAULT_LOCAL_PROMPT_CACHE)
+        self.local_prompt_cache_path = self.get('local_model.prompt_cache_path',
+                                                manager.DEFAULT_LOCAL_PROMPT_CACHE_PATH)
+        self.cloud_model = self.get('cloud_model', 'gemini-1.5-pro')
+        # Max cloud LLM requests in flight at once (auto-solver)
+        self.cloud_concurrency = self.get('cloud_concurrency', manager.DEFAULT_CLOUD_CONCURRENCY)
+        # Cloud LLM requests allowed per minute (auto-solver rate limit)
+        self.cloud_rpm = self.get('cloud_rpm', manager.DEFAULT_CLOUD_RPM)
+        # Background answer jobs run at once (API server, async /api/ask)
+        self.llm_concurrency = self.get('llm_concurrency', manager.DEFAULT_LLM_CONCURRENCY)
+        # Repeat prompts answered from the LLM wrappers' memory (opt-in; at
+        # temperature > 0 they then always get the same sample)
+        self.llm_response_cache = self.get('llm_response_cache', manager.DEFAULT_LLM_RESPONSE_CACHE)
+
+        # === Cloud Sanitization ===
+        self.max_chunk_chars_cloud = self.get('sanitization.max_chunk_chars_sent_to_cloud',
+                                              manager.DEFAULT_MAX_CHUNK_CHARS_CLOUD)
+        self.max_chunks_cloud = self.get('sanitization.max_chunks_sent_to_cloud',
+                                         manager.DEFAULT_MAX_CHUNKS_CLOUD)
+        self.remove_pii = self.get('sanitization.remove_pii', True)
+
+        # === Database ===
+        self.chroma_persist_dir = self.get('chroma_persist_dir', str(paths.CHROMA_DB_DIR))
+        self.enable_bm25 = self.get('enable_bm25', manager.DEFAULT_ENABLE_BM25)
+        self.reload_on_start = self.get('reload_on_start', manager.DEFAULT_RELOAD_ON_START)
+
+        # === Server Configuration ===
+        self.server_host = self.get('server.host', manager.DEFAULT_SERVER_HOST)
+        self.server_port = self.get('server.port', manager.DEFAULT_SERVER_PORT)
+        self.server_debug = self.get('server.debug', manager.DEFAULT_SERVER_DEBUG)
+        self.server_threads = self.get('server.threads', manager.DEFAULT_SERVER_THREADS)
+        self.api_key_for_admin = self.get('server.api_key_for_admin') or os.getenv('ATHENA_ADMIN_KEY')
+
+        # === Answer Cache ===
+        # Answers kept in memory in front of the on-disk cache
+        self.cache_hot_entries = self.get('cache_hot_entries', manager.DEFAULT_CACHE_HOT_ENTRIES)
+        self.warmup_questions_path = self.get('warmup_questions_path', manager.DEFAULT_WARMUP_QUESTIONS_PATH)
+
+        # === Feature Flags ===
+        self.show_sources_on_answer = self.get('show_sources_on_answer', manager.DEFAULT_SHOW_SOURCES)
+
+        # === Paths (delegated to paths module) ===
+        self.data_dir = paths.DATA_DIR
+        self.cache_dir = paths.CACHE_DIR
+        self.logs_dir = paths.LOGS_DIR
+
+        self._config = MappingProxyType(self._config)
 
 
 # Convenience function
@@ -14,22 +14,44 @@ DEFAULT_CHUNK_OVERLAP = 150
 # Embedding defaults
 DEFAULT_EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
 DEFAULT_EMBED_BATCH_SIZE = 32
+# "torch" is FP32 (FP16 on CUDA). "onnx" is opt-in (needs
+# optimum[onnxruntime]) and loads the model's FP32 ONNX export, or the file
+# named by embedding_onnx_file, e.g. the int8 "model_qint8_avx512_vnni.onnx":
+# fast only on CPUs with AVX512-VNNI, and its vectors drift slightly from a
+# collection embedded in FP32 (re-ingest after switching)
+DEFAULT_EMBEDDING_BACKEND = "torch"
+DEFAULT_EMBEDDING_ONNX_FILE = None
 
 # LLM defaults
 DEFAULT_LLM_TIMEOUT = 240
 DEFAULT_MAX_TOKENS = 2048
 DEFAULT_N_CTX = 8192
 DEFAULT_TEMPERATURE = 0.15
+DEFAULT_CLOUD_CONCURRENCY = 4
+DEFAULT_CLOUD_RPM = 60
+DEFAULT_LLM_CONCURRENCY = 2
+# Reuse completions for repeat prompts (in memory, per LLM wrapper)
+DEFAULT_LLM_RESPONSE_CACHE = False
+# llama.cpp KV-state cache keyed by prompt prefix (copies the KV state
+# after every call; in memory unless a directory is given)
+DEFAULT_LOCAL_PROMPT_CACHE = False
+DEFAULT_LOCAL_PROMPT_CACHE_PATH = None
 
 # Server defaults
 DEFAULT_SERVER_HOST = "127.0.0.1"
 DEFAULT_SERVER_PORT = 5000
 DEFAULT_SERVER_DEBUG = False
+DEFAULT_SERVER_THREADS = 16
 
 # Cloud sanitization defaults
 DEFAULT_MAX_CHUNK_CHARS_CLOUD = 1500
 DEFAULT_MAX_CHUNKS_CLOUD = 2
 
+# Answer cache defaults
+DEFAULT_CACHE_HOT_ENTRIES = 1024
+# JSON list of questions answered at server start to pre-fill the caches
+DEFAULT_WARMUP_QUESTIONS_PATH = None
+
 # Feature flags
 DEFAULT_ENABLE_BM25 = True
 DEFAULT_RELOAD_ON_START = False
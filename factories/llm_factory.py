@@ -1,9 +1,14 @@
 """
 LLM Factory - Handles initialization of different LLM providers.
 Uses Factory Pattern to encapsulate LLM creation logic.
+
+Successfully created instances are cached per (provider, settings), so a
+second AthenaApp/AIIntegration in the same process reuses the loaded
+model instead of paying the load again. Failures are not cached.
 """
 import os
 import logging
+from functools import lru_cache
 from typing import Optional, Tuple
 from config import get_config
 
@@ -44,13 +49,18 @@ class LLMFactory:
         config = get_config()
         
         try:
-            llm = OllamaLLM(model=config.ollama_model)
-            logger.info(f"✅ Initialized Ollama: {config.ollama_model}")
-            return llm
+            return LLMFactory._cached_ollama(OllamaLLM, config.ollama_model)
         except Exception as e:
             logger.warning(f"Ollama initialization failed: {e}")
             return None
     
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def _cached_ollama(llm_cls, model: str):
+        llm = llm_cls(model=model)
+        logger.info(f"✅ Initialized Ollama: {model}")
+        return llm
+    
     @staticmethod
     def _create_llamacpp_llm():
         """Create llama-cpp LLM instance"""
@@ -62,18 +72,36 @@ class LLMFactory:
             return None
         
         try:
-            llm = LocalLLM(
-                model_path=config.local_model_path,
-                max_tokens=config.max_tokens,
-                n_ctx=config.n_ctx,
-                temperature=config.temperature,
+            return LLMFactory._cached_llamacpp(
+                LocalLLM,
+                config.local_model_path,
+                config.max_tokens,
+                config.n_ctx,
+                config.temperature,
+                config.llm_response_cache,
+                config.local_prompt_cache,
+                config.local_prompt_cache_path,
             )
-            logger.info(f"✅ Initialized llama-cpp: {config.local_model_path}")
-            return llm
         except Exception as e:
             logger.warning(f"llama-cpp initialization failed: {e}")
             return None
     
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def _cached_llamacpp(llm_cls, model_path: str, max_tokens: int, n_ctx: int, temperature: float,
+                         response_cache: bool, prompt_cache: bool, prompt_cache_path: Optional[str]):
+        llm = llm_cls(
+            model_path=model_path,
+            max_tokens=max_tokens,
+            n_ctx=n_ctx,
+            temperature=temperature,
+            response_cache=response_cache,
+            prompt_cache=prompt_cache,
+            prompt_cache_path=prompt_cache_path,
+        )
+        logger.info(f"✅ Initialized llama-cpp: {model_path}")
+        return llm
+    
     @staticmethod
     def create_cloud_llm(api_key: Optional[str] = None):
         """
@@ -96,17 +124,24 @@ class LLMFactory:
             return None
         
         try:
-            llm = CloudLLM(
-                api_key=api_key,
-                model=config.cloud_model,
-                max_output_tokens=config.max_tokens
-            )
-            logger.info(f"✅ Initialized Cloud LLM: {config.cloud_model}")
-            return llm
+            return LLMFactory._cached_cloud(CloudLLM, api_key, config.cloud_model, config.max_tokens,
+                                            config.llm_response_cache)
         except Exception as e:
             logger.warning(f"Cloud LLM initialization failed: {e}")
             return None
     
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def _cached_cloud(llm_cls, api_key: str, model: str, max_output_tokens: int, response_cache: bool):
+        llm = llm_cls(
+            api_key=api_key,
+            model=model,
+            max_output_tokens=max_output_tokens,
+            response_cache=response_cache
+        )
+        logger.info(f"✅ Initialized Cloud LLM: {model}")
+        return llm
+    
     @staticmethod
     def create_llms(api_key: Optional[str] = None) -> Tuple[Optional[any], Optional[any]]:
         """
@@ -1,29 +1,64 @@
 # flask_api_server.py 
 
 import os
+import json
+import queue
+import atexit
+import hashlib
 import logging
-from flask import Flask, request, jsonify, abort
+import logging.handlers
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from functools import lru_cache
+from flask import Blueprint, Flask, Response, request, jsonify, abort
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
+from werkzeug.exceptions import HTTPException
 from dotenv import load_dotenv
+from pathlib import Path
 from typing import Dict, Any, Tuple
 
 from config import get_config, paths
 
 load_dotenv()
 
-# Logging
+# Logging: request threads only enqueue records; a listener thread does
+# the console and file writes. The queue handler formats each record, so
+# the output handlers just write the finished line.
+_log_queue = queue.SimpleQueue()
+_log_listener = logging.handlers.QueueListener(
+    _log_queue,
+    logging.StreamHandler(),
+    logging.FileHandler(paths.get_log_file("athena_api"), encoding="utf-8")
+)
+_log_listener.start()
+atexit.register(_log_listener.stop)
+
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler(paths.get_log_file("athena_api"), encoding="utf-8")
-    ]
+    handlers=[logging.handlers.QueueHandler(_log_queue)]
 )
 logger = logging.getLogger(__name__)
 
 config = get_config()
 
+# Production WSGI server (optional; falls back to Flask's dev server)
+try:
+    from waitress import serve
+except Exception:
+    serve = None
+    logger.debug("⚠️ waitress not available; using Flask development server")
+
+try:
+    import orjson
+except Exception:
+    orjson = None
+    logger.debug("⚠️ orjson not available; using stdlib json for API bodies")
+
 # Import Athena app
 try:
     from main import AthenaApp
@@ -31,34 +66,254 @@ except Exception as e:
     logger.exception("Failed to import AthenaApp from main.py: %s", e)
     raise
 
-# Flask app
-app = Flask(__name__)
-CORS(app)
+class ORJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider backed by orjson (keys sorted like the default
+    provider). jsonify() responses are built straight from orjson's bytes,
+    and numpy scores that leak into payloads serialize natively.
+    """
 
-# Instantiate Athena system - FIXED: Using config.data_dir
-SYSTEM = AthenaApp(
-    data_dir=str(config.data_dir),
-    gemini_api_key=os.getenv("GOOGLE_API_KEY")
-)
+    def _option(self, sort_keys: bool, indent: bool) -> int:
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps(self, obj, **kwargs):
+        option = self._option(kwargs.get("sort_keys", self.sort_keys), kwargs.get("indent"))
+        return orjson.dumps(obj, default=self.default, option=option).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        body = orjson.dumps(obj, default=self.default, option=self._option(self.sort_keys, indent))
+        return self._app.response_class(body + b"\n", mimetype=self.mimetype)
+
+
+# API routes; registered on the app by create_app()
+api = Blueprint("api", __name__)
+
+
+@api.errorhandler(400)
+def bad_request(e) -> Tuple[Dict[str, Any], int]:
+    """JSON body for validation errors, like the other API errors"""
+    return jsonify({"error": e.description}), 400
+
+@lru_cache(maxsize=1)
+def get_system() -> AthenaApp:
+    """The process-wide Athena system, built on first use - FIXED: Using config.data_dir"""
+    return AthenaApp(
+        data_dir=str(config.data_dir),
+        gemini_api_key=os.getenv("GOOGLE_API_KEY")
+    )
+
+# Background answer jobs for async /api/ask; results are kept until fetched,
+# or evicted JOB_RESULT_TTL seconds after finishing (oldest finished first
+# past MAX_JOBS) so clients that never poll don't pile them up
+EXECUTOR = ThreadPoolExecutor(max_workers=config.llm_concurrency, thread_name_prefix="athena-ask")
+JOBS: Dict[str, Future] = {}
+JOBS_LOCK = threading.Lock()
+JOB_RESULT_TTL = 600.0
+MAX_JOBS = 1024
+# How long an async request waits inline (covers cache hits) before
+# handing back a job id
+ASYNC_INLINE_WAIT = 0.05
+
+# Set once startup warmup has initialized RAG (successfully or not); the
+# local LLM is warmed and warmup questions pre-answered after it is set.
+# Requests wait at most WARMUP_WAIT_TIMEOUT seconds for it, then get a 503
+WARMUP_DONE = threading.Event()
+WARMUP_WAIT_TIMEOUT = 60.0
+_warmup_thread = None
+_warmup_lock = threading.Lock()
+
+
+def _warmup():
+    """
+    Pay the cold start before the first request: load Chroma and BM25
+    and run one embedding. Then, with requests already being served,
+    have the local LLM load its weights and answer the configured warmup
+    questions so they start out cached.
+    """
+    try:
+        system = get_system()
+    except Exception:
+        logger.exception("Failed to create AthenaApp")
+        WARMUP_DONE.set()
+        return
 
-# Initialize RAG at startup
-try:
-    logger.info("Initializing RAG at server start...")
-    SYSTEM.initialize_rag()
-    logger.info("RAG initialized successfully")
-    logger.info(f"Query service available: {SYSTEM.query_service is not None}")
-except Exception as e:
-    logger.warning("RAG failed at startup: %s", e)
+    try:
+        logger.info("Initializing RAG at server start...")
+        system.initialize_rag()
+        logger.info("RAG initialized successfully")
+        logger.info(f"Query service available: {system.query_service is not None}")
+        system.rag._embed_texts(["warmup"])
+    except Exception as e:
+        logger.warning("RAG failed at startup: %s", e)
+
+    # Ready: requests (cloud ones never touch the local model) shouldn't
+    # wait for the local LLM or the warmup questions
+    WARMUP_DONE.set()
+    logger.info("Warmup complete")
+
+    if system.ai.local_llm is not None:
+        try:
+            system.ai.local_llm.warmup(timeout=config.llm_timeout_seconds)
+        except Exception as e:
+            logger.warning("Local LLM warmup failed: %s", e)
+
+    if config.warmup_questions_path and system.query_service is not None:
+        _answer_warmup_questions(config.warmup_questions_path)
+
+
+def _answer_warmup_questions(questions_path: str):
+    """Run each question in a JSON list through the (memoized) local pipeline"""
+    try:
+        raw = Path(questions_path).read_bytes()
+        questions = orjson.loads(raw) if orjson is not None else json.loads(raw)
+    except Exception as e:
+        logger.warning("Could not read warmup questions %s: %s", questions_path, e)
+        return
+
+    answered = 0
+    for question in questions:
+        if not isinstance(question, str) or not question.strip():
+            continue
+        try:
+            _cached_answer(question.strip(), False, None, None)
+            answered += 1
+        except Exception as e:
+            logger.warning("Warmup question failed (%s): %s", question[:60], e)
+    logger.info("Pre-answered %d warmup questions", answered)
+
+
+def _start_warmup():
+    """Start the background warmup once per process"""
+    global _warmup_thread
+    if _warmup_thread is not None:
+        return
+    with _warmup_lock:
+        if _warmup_thread is None:
+            _warmup_thread = threading.Thread(target=_warmup, name="athena-warmup", daemon=True)
+            _warmup_thread.start()
+
+
+
+def _parse_json() -> Dict[str, Any]:
+    """Request body as a JSON object, or {} if it is empty or not an object"""
+    raw = request.get_data(cache=False)
+    if not raw:
+        return {}
+    try:
+        data = orjson.loads(raw) if orjson is not None else json.loads(raw)
+    except ValueError:
+        return {}
+    return data if isinstance(data, dict) else {}
 
 
 def _validate_json_request(required: list, payload: dict):
-    """Validate required fields in JSON request"""
-    missing = [k for k in required if k not in payload or payload.get(k) in (None, "")]
-    if missing:
-        abort(400, description=f"Missing required fields: {', '.join(missing)}")
+    """Validate required fields in JSON request (400 on the first missing one)"""
+    for k in required:
+        if payload.get(k) in (None, ""):
+            abort(400, description=f"Missing required field: {k}")
+
+
+def _validate_string_fields(fields: list, payload: dict):
+    """400 unless each field is absent, null or a string"""
+    for k in fields:
+        value = payload.get(k)
+        if value is not None and not isinstance(value, str):
+            abort(400, description=f"Field must be a string: {k}")
+
+
+# Response payloads memoized per (question, mode, filters)
+ANSWER_MEMO_SIZE = 1024
+_answer_memo: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+_answer_memo_lock = threading.Lock()
+
+
+def _cached_answer(question: str, use_cloud: bool, subject, module) -> Dict[str, Any]:
+    """
+    Run the query pipeline and return the response payload, memoized per
+    (question, mode, filters); a memo hit comes back with cached=True.
+    Exceptions, empty answers and ❌ error answers (e.g. nothing found
+    before new documents are ingested) are not cached; /api/reload clears
+    the memo since answers depend on the index.
+    """
+    key = (question, use_cloud, subject, module)
+    with _answer_memo_lock:
+        payload = _answer_memo.get(key)
+        if payload is not None:
+            _answer_memo.move_to_end(key)
+            return dict(payload, cached=True)
+
+    result = get_system().query_service.execute_query(
+        question=question,
+        use_cloud=use_cloud,
+        subject_filter=subject,
+        module_filter=module
+    )
+    payload = {
+        "answer": result.answer,
+        "cached": result.cached,
+        "mode": result.mode,
+        "sources": [s.to_dict() for s in result.sources],
+        "total_sources": result.total_sources
+    }
+    if not result.answer or result.answer.startswith("❌"):
+        return payload
+    with _answer_memo_lock:
+        _answer_memo[key] = payload
+        _answer_memo.move_to_end(key)
+        while len(_answer_memo) > ANSWER_MEMO_SIZE:
+            _answer_memo.popitem(last=False)
+    return payload
+
 
+def _clear_answer_memo():
+    with _answer_memo_lock:
+        _answer_memo.clear()
 
-@app.route("/api/ask", methods=["POST"])
+
+def _payload_etag(payload: Dict[str, Any]) -> str:
+    """ETag over the answer content (not the cached flag)"""
+    content = [payload["answer"], payload["mode"], payload["sources"]]
+    if orjson is not None:
+        body = orjson.dumps(content, default=str,
+                            option=orjson.OPT_SORT_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    else:
+        body = json.dumps(content, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.md5(body).hexdigest()
+
+
+def _dump(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, default=str,
+                            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, default=str).encode("utf-8")
+
+
+def _stream_payload(payload: Dict[str, Any]):
+    """
+    Yield an /api/ask payload as JSON in pieces: the answer (what the
+    client is waiting for) goes out first, then the sources one by one.
+    """
+    yield b'{"answer":' + _dump(payload["answer"])
+    for key, value in payload.items():
+        if key not in ("answer", "sources"):
+            yield b',' + _dump(key) + b':' + _dump(value)
+    yield b',"sources":['
+    for i, source in enumerate(payload["sources"]):
+        yield (b',' if i else b'') + _dump(source)
+    yield b']}\n'
+
+
+@api.route("/api/ask", methods=["POST"])
 def ask_question() -> Tuple[Dict[str, Any], int]:
     """
     Answer a question using RAG.
@@ -68,61 +323,147 @@ def ask_question() -> Tuple[Dict[str, Any], int]:
       "question": "string",
       "use_cloud": false,
       "subject": "...",
-      "module": "..."
+      "module": "...",
+      "async": false
     }
+    
+    With "async": true, answers that are not ready right away come back
+    as 202 {"job_id": ...}; poll /api/ask/result/<job_id> for the result.
     """
     try:
-        data = request.get_json(silent=True) or {}
+        data = _parse_json()
         _validate_json_request(["question"], data)
+        # Filters are memo keys and query arguments: lists/objects can't be either
+        _validate_string_fields(["question", "subject", "module"], data)
+
+        # Don't race the startup warmup into a second initialize_rag()
+        _start_warmup()
+        if not WARMUP_DONE.wait(WARMUP_WAIT_TIMEOUT):
+            return jsonify({"error": "Server is warming up, retry shortly"}), 503
+        system = get_system()
 
         question = data["question"].strip()
-        use_cloud = bool(data.get("use_cloud", config.use_cloud_by_default))
+        use_cloud = data.get("use_cloud", config.use_cloud_by_default)
+        if use_cloud is not True and use_cloud is not False:
+            use_cloud = bool(use_cloud)
         subject = data.get("subject")
         module = data.get("module")
 
-        logger.info("API /api/ask - len=%d use_cloud=%s subject=%s module=%s",
-                    len(question), use_cloud, subject, module)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("API /api/ask - len=%d use_cloud=%s subject=%s module=%s",
+                        len(question), use_cloud, subject, module)
 
         # FIXED: Ensure RAG and query service are initialized
-        if SYSTEM.rag is None or SYSTEM.query_service is None:
+        if system.rag is None or system.query_service is None:
             logger.info("Query service not initialized; initializing now")
-            if not SYSTEM.initialize_rag():
+            if not system.initialize_rag():
                 return jsonify({"error": "RAG initialization failed"}), 500
 
-        # FIXED: Always use SYSTEM.query_service (no global variable)
-        if not SYSTEM.query_service:
+        # FIXED: Always use system.query_service (no global variable)
+        if not system.query_service:
             return jsonify({"error": "Query service not available"}), 500
 
-        # Execute query using the service
-        result = SYSTEM.query_service.execute_query(
-            question=question,
-            use_cloud=use_cloud,
-            subject_filter=subject,
-            module_filter=module
-        )
+        if data.get("async"):
+            return _submit_answer_job(question, use_cloud, subject, module)
 
-        # Return standardized response
-        return jsonify({
-            "answer": result.answer,
-            "cached": result.cached,
-            "mode": result.mode,
-            "sources": [s.to_dict() for s in result.sources],
-            "total_sources": result.total_sources
-        }), 200
+        # Execute query using the service (memoized per question/mode/filters)
+        payload = _cached_answer(question, use_cloud, subject, module)
+
+        # Let clients holding this exact answer skip the body
+        etag = _payload_etag(payload)
+        if etag in request.if_none_match:
+            response = Response(status=304)
+            response.set_etag(etag)
+            return response
 
+        # Return standardized response (streamed: answer first, then sources)
+        response = Response(_stream_payload(payload), mimetype="application/json")
+        response.set_etag(etag)
+        return response, 200
+
+    except HTTPException:
+        # abort() from validation: let the 400 through instead of a 500
+        raise
     except Exception as e:
         logger.exception("Error in /api/ask")
         return jsonify({"error": str(e)}), 500
 
 
-@app.route("/api/stats", methods=["GET"])
+def _submit_answer_job(question: str, use_cloud: bool, subject, module):
+    """Run the query on the background pool; reply inline if it finishes fast"""
+    future = EXECUTOR.submit(_cached_answer, question, use_cloud, subject, module)
+    try:
+        return jsonify(future.result(timeout=ASYNC_INLINE_WAIT)), 200
+    except FutureTimeout:
+        pass
+
+    job_id = uuid.uuid4().hex
+    future.add_done_callback(_mark_job_done)
+    with JOBS_LOCK:
+        _evict_jobs()
+        JOBS[job_id] = future
+    return jsonify({"job_id": job_id, "status": "pending"}), 202
+
+
+def _mark_job_done(future: Future):
+    future.done_at = time.monotonic()
+
+
+def _evict_jobs():
+    """Drop finished jobs past their TTL, then the oldest finished past MAX_JOBS (JOBS_LOCK held)"""
+    now = time.monotonic()
+    finished = [(job_id, f.done_at) for job_id, f in JOBS.items() if getattr(f, "done_at", None) is not None]
+    excess = len(JOBS) - MAX_JOBS + 1
+    for job_id, done_at in sorted(finished, key=lambda item: item[1]):
+        if now - done_at > JOB_RESULT_TTL or excess > 0:
+            del JOBS[job_id]
+            excess -= 1
+
+
+@api.route("/api/ask/result/<job_id>", methods=["GET"])
+def ask_result(job_id: str) -> Tuple[Dict[str, Any], int]:
+    """Poll a background answer job (202 while pending)"""
+    with JOBS_LOCK:
+        future = JOBS.get(job_id)
+        if future is None:
+            return jsonify({"error": "unknown job_id"}), 404
+        if not future.done():
+            return jsonify({"job_id": job_id, "status": "pending"}), 202
+        del JOBS[job_id]
+
+    try:
+        return jsonify(future.result()), 200
+    except Exception as e:
+        logger.exception("Error in /api/ask job %s", job_id)
+        return jsonify({"error": str(e)}), 500
+
+
+# Collection stats are polled by health checks; refresh at most every
+# STATS_TTL seconds instead of querying Chroma on every probe
+STATS_TTL = 5.0
+_stats_cache = {"t": 0.0, "v": None}
+_stats_lock = threading.Lock()
+
+
+def _collection_stats(rag, refresh: bool = False) -> Dict[str, Any]:
+    """rag.get_collection_stats(), memoized for STATS_TTL seconds"""
+    with _stats_lock:
+        now = time.monotonic()
+        if refresh or _stats_cache["v"] is None or now - _stats_cache["t"] > STATS_TTL:
+            _stats_cache["v"] = rag.get_collection_stats()
+            _stats_cache["t"] = now
+        return _stats_cache["v"]
+
+
+@api.route("/api/stats", methods=["GET"])
 def get_stats() -> Tuple[Dict[str, Any], int]:
     """Get database statistics"""
     try:
-        if SYSTEM.rag is None:
+        system = get_system()
+        if system.rag is None:
             return jsonify({"error": "RAG not initialized"}), 500
 
-        stats = SYSTEM.rag.get_collection_stats()
+        stats = _collection_stats(system.rag)
         return jsonify({"status": "ok", "stats": stats}), 200
 
     except Exception as e:
@@ -130,30 +471,43 @@ def get_stats() -> Tuple[Dict[str, Any], int]:
         return jsonify({"error": str(e)}), 500
 
 
-@app.route("/api/health", methods=["GET"])
+@api.route("/api/warmup", methods=["GET"])
+def warmup_status() -> Tuple[Dict[str, Any], int]:
+    """Readiness: 200 once startup warmup has initialized RAG, 503 before"""
+    _start_warmup()
+    ready = WARMUP_DONE.is_set()
+    return jsonify({"ready": ready}), 200 if ready else 503
+
+
+@api.route("/api/health", methods=["GET"])
 def health_check() -> Tuple[Dict[str, Any], int]:
-    """Health check endpoint"""
+    """Health check endpoint (503 until warmup finishes)"""
+    _start_warmup()
     try:
+        if not WARMUP_DONE.is_set():
+            return jsonify({"status": "warming_up"}), 503
+        system = get_system()
+
         total_chunks = None
-        if SYSTEM.rag:
+        if system.rag:
             try:
-                total_chunks = SYSTEM.rag.get_collection_stats().get("total_chunks")
+                total_chunks = _collection_stats(system.rag).get("total_chunks")
             except Exception:
                 total_chunks = None
 
         return jsonify({
             "status": "healthy",
-            "local_llm": SYSTEM.ai.has_local_llm(),
-            "cloud_llm": SYSTEM.ai.has_cloud_llm(),
+            "local_llm": system.ai.has_local_llm(),
+            "cloud_llm": system.ai.has_cloud_llm(),
             "total_chunks": total_chunks,
-            "query_service_available": SYSTEM.query_service is not None
+            "query_service_available": system.query_service is not None
         }), 200
 
     except Exception:
         return jsonify({"status": "unhealthy"}), 500
 
 
-@app.route("/api/reload", methods=["POST"])
+@api.route("/api/reload", methods=["POST"])
 def reload_index() -> Tuple[Dict[str, Any], int]:
     """
     Re-ingest documents with optional admin key.
@@ -162,18 +516,20 @@ def reload_index() -> Tuple[Dict[str, Any], int]:
         admin_key = config.api_key_for_admin
 
         if admin_key:
-            data = request.get_json(silent=True) or {}
+            data = _parse_json()
             if data.get("api_key") != admin_key:
                 return jsonify({"error": "invalid api_key"}), 403
 
         logger.info("Rebuilding DB via /api/reload")
-        SYSTEM.rag.clear_database()
+        system = get_system()
+        system.rag.clear_database()
         # FIXED: Use config.data_dir instead of hardcoded "./data"
-        SYSTEM.rag.ingest_directory(str(config.data_dir), rebuild_bm25=True)
+        system.rag.ingest_directory(str(config.data_dir), rebuild_bm25=True)
+        _clear_answer_memo()
 
         return jsonify({
             "status": "reloaded",
-            "total_chunks": SYSTEM.rag.get_collection_stats().get("total_chunks")
+            "total_chunks": _collection_stats(system.rag, refresh=True).get("total_chunks")
         }), 200
 
     except Exception as e:
@@ -181,10 +537,37 @@ def reload_index() -> Tuple[Dict[str, Any], int]:
         return jsonify({"error": str(e)}), 500
 
 
+def create_app() -> Flask:
+    """Build the Flask app: JSON provider, CORS and the API routes"""
+    flask_app = Flask(__name__)
+    if orjson is not None:
+        flask_app.json = ORJSONProvider(flask_app)
+    CORS(flask_app)
+    flask_app.register_blueprint(api)
+    return flask_app
+
+
+# Flask app
+app = create_app()
+
+# Warm up in the background so the server can answer readiness probes.
+# The debug reloader's parent process only watches files, so leave the
+# model loading to the serving child (requests start it otherwise).
+if not config.server_debug or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+    _start_warmup()
+
+
 if __name__ == "__main__":
     host = config.server_host
     port = config.server_port
     debug = config.server_debug
 
-    logger.info("Starting Athena API server on %s:%s", host, port)
-    app.run(host=host, port=port, debug=debug)
\ No newline at end of file
+    if serve is not None and not debug:
+        # Worker threads keep /api/health and /api/stats responsive while
+        # other threads are blocked on multi-second LLM calls
+        logger.info("Starting Athena API server (waitress, %d threads) on %s:%s",
+                    config.server_threads, host, port)
+        serve(app, host=host, port=port, threads=config.server_threads)
+    else:
+        logger.info("Starting Athena API server on %s:%s", host, port)
+        app.run(host=host, port=port, debug=debug, threaded=True)
\ No newline at end of file
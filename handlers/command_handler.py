@@ -3,6 +3,7 @@ Command Handler - Processes user commands in interactive session.
 Separates command logic from the main interactive loop.
 """
 import logging
+from functools import partial
 from typing import Optional, Dict, Any
 from services import ContextAssembler, QueryService
 from config import get_config
@@ -26,6 +27,22 @@ class CommandHandler:
         self.config = get_config()
         self.filters = {"subject": None, "module": None}
         self.use_cloud = self.config.use_cloud_by_default
+        
+        # Exact-match commands -> handler (one dict lookup per input)
+        self._commands = {
+            "quit": self._handle_quit,
+            "exit": self._handle_quit,
+            "q": self._handle_quit,
+            "stats": self._handle_stats,
+            "local": partial(self._handle_mode_switch, use_cloud=False),
+            "cloud": partial(self._handle_mode_switch, use_cloud=True),
+            "help": self._handle_help,
+        }
+        # Prefix commands that take an argument from the raw input
+        self._prefix_commands = (
+            ("filter subject:", self._handle_subject_filter),
+            ("filter module:", self._handle_module_filter),
+        )
     
     def handle_command(self, user_input: str) -> CommandResult:
         """
@@ -39,30 +56,26 @@ class CommandHandler:
         """
         inp = user_input.strip().lower()
         
-        # Exit commands
-        if inp in ("quit", "exit", "q"):
-            return CommandResult(continue_loop=False, message="Goodbye! 👋")
-        
         # Empty input
         if not inp:
             return CommandResult(continue_loop=True)
         
         # Command routing
-        if inp == "stats":
-            return self._handle_stats()
-        elif inp == "local":
-            return self._handle_mode_switch(use_cloud=False)
-        elif inp == "cloud":
-            return self._handle_mode_switch(use_cloud=True)
-        elif inp.startswith("filter subject:"):
-            return self._handle_subject_filter(user_input)
-        elif inp.startswith("filter module:"):
-            return self._handle_module_filter(user_input)
-        elif inp == "help":
-            return self._handle_help()
-        else:
-            # It's a question
-            return self._handle_question(user_input.strip())
+        command = self._commands.get(inp)
+        if command is not None:
+            return command()
+        
+        if inp.startswith("filter "):
+            for prefix, command in self._prefix_commands:
+                if inp.startswith(prefix):
+                    return command(user_input)
+        
+        # It's a question
+        return self._handle_question(user_input.strip())
+    
+    def _handle_quit(self) -> CommandResult:
+        """Exit the interactive session"""
+        return CommandResult(continue_loop=False, message="Goodbye! 👋")
     
     def _handle_stats(self) -> CommandResult:
         """Show database statistics"""
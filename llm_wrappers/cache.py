@@ -0,0 +1,54 @@
+# llm_wrappers/cache.py
+
+"""
+In-memory response cache shared by the LLM wrappers.
+
+Keyed on everything that shapes a completion (model, prompt, token limit,
+temperature). Opt-in per wrapper (config: llm_response_cache): above
+temperature 0 a cached completion is one valid sample, so repeat prompts
+get the same answer instead of a fresh one.
+"""
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+
+class LLMCache:
+    """Thread-safe LRU of successful generate() results, with optional TTL"""
+
+    def __init__(self, max_entries: int = 256, ttl: Optional[float] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(model: str, prompt: str, max_tokens: int, temperature: float) -> str:
+        key = json.dumps({"m": model, "p": prompt, "t": max_tokens, "temp": temperature}, sort_keys=True)
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Cached result for key (marked meta.cached), or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, result = entry
+            if self.ttl is not None and time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        return {"text": result["text"], "error": None, "meta": dict(result.get("meta", {}), cached=True)}
+
+    def put(self, key: str, result: Dict[str, Any]):
+        """Store a result; failed generations are never cached"""
+        if result.get("error") or not result.get("text"):
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
@@ -1,19 +1,145 @@
 # llm_wrappers/llm_cloud.py
 
+import json
 import time
+import random
+import asyncio
 import logging
-from typing import Dict, Any, Optional
+import threading
+from functools import cached_property
+from typing import Callable, Dict, Any, Iterator, List, Optional
+
+from exceptions import LLMError
+from utils.rate_limiter import TokenBucket
+from utils.circuit_breaker import CircuitBreaker
+from llm_wrappers.cache import LLMCache
+from llm_wrappers.single_flight import SingleFlightMixin
 
 logger = logging.getLogger(__name__)
 
 try:
     import google.generativeai as genai
+    from google.generativeai import client as genai_client
 except Exception:
     genai = None
-    logger.debug("⚠️ google.generativeai not available; CloudLLM disabled")
+    genai_client = None
+    logger.debug("⚠️ google.generativeai not available")
+
+# Preferred transport: plain REST over a pooled keep-alive client
+try:
+    import httpx
+except Exception:
+    httpx = None
+    logger.debug("⚠️ httpx not available; CloudLLM uses the Gemini SDK")
+
+try:
+    import h2  # noqa: F401  (enables HTTP/2 in httpx)
+    HTTP2 = True
+except Exception:
+    HTTP2 = False
+
+try:
+    import orjson
+except Exception:
+    orjson = None
+
+GEMINI_API_BASE = "https://generativelanguage.googleapis.com/v1beta"
+
+# Room for many concurrent calls (batch_generate, API threads) without
+# queueing on httpx's default pool, and keep-alive so TLS is paid once
+HTTP_LIMITS = httpx.Limits(max_connections=512, max_keepalive_connections=256) if httpx else None
+
+# Largest group CloudLLM.marshal_batch packs into one request; beyond
+# this answers start to drift or get merged
+MARSHAL_MAX_K = 16
+
+# genai.configure swaps the SDK's process-global default client, and a
+# GenerativeModel only fetches that client on its first call; configure and
+# take the client under one lock so each model stays on its own key
+_configure_lock = threading.Lock()
+
+
+def _genai_client(api_key: str, get_client):
+    """SDK client made while api_key is the configured key"""
+    with _configure_lock:
+        genai.configure(api_key=api_key)
+        return get_client()
 
 
-class CloudLLM:
+def _parts_text(parts) -> str:
+    # One getattr per part (hasattr + .text is two lookups); join is
+    # faster on a list than on a generator
+    return ''.join([text for part in parts if (text := getattr(part, "text", None))])
+
+
+def _sdk_text(r) -> str:
+    return r.text or ""
+
+
+def _sdk_parts_text(r) -> str:
+    return _parts_text(r.parts)
+
+
+def _sdk_candidate_text(r) -> str:
+    return _parts_text(r.candidates[0].content.parts) if r.candidates else ""
+
+
+def _dict_text(r: dict) -> str:
+    # REST API: {"candidates": [{"content": {"parts": [{"text": ...}]}}]}
+    cands = r.get("candidates")
+    if cands and isinstance(cands, list):
+        c0 = cands[0]
+        if isinstance(c0, dict):
+            content = c0.get("content")
+            if isinstance(content, dict):
+                return ''.join([part.get("text", "") for part in content.get("parts", ())])
+            if isinstance(content, str):
+                return content
+            if "text" in c0:
+                return c0["text"]
+    if "text" in r:
+        return r["text"]
+    if "output_text" in r:
+        return r["output_text"]
+    # Blocked or empty reply (only promptFeedback, or a candidate without
+    # content): no text, never the raw JSON, so it is treated as empty
+    feedback = r.get("promptFeedback")
+    reason = feedback.get("blockReason") if isinstance(feedback, dict) else None
+    if reason is None and cands and isinstance(cands, list) and isinstance(cands[0], dict):
+        reason = cands[0].get("finishReason")
+    if reason != "STOP":
+        # (a content-less STOP is just the tail of a stream)
+        logger.warning(f"Gemini response has no text (reason: {reason or 'unknown'})")
+    return ""
+
+
+# Response type -> extractor. SDK response classes are probed once by
+# _probe_text and the accessor that worked is remembered for that type.
+_EXTRACTORS: Dict[type, Callable[[Any], str]] = {
+    type(None): lambda r: "",
+    dict: _dict_text,
+}
+
+
+def _probe_text(r: Any) -> str:
+    """Slow path: try each known response shape, caching the one that works"""
+    for extractor in (
+        _sdk_text,                      # v0.3+ (current SDK version)
+        _sdk_parts_text,
+        _sdk_candidate_text,
+    ):
+        try:
+            text = extractor(r)
+        except Exception:
+            continue
+        _EXTRACTORS.setdefault(type(r), extractor)
+        return text
+
+    # Last fallback
+    return str(r)
+
+
+class CloudLLM(SingleFlightMixin):
     """
     Stable, retry-capable wrapper for Gemini 1.5.
     Returns uniform structure:
@@ -25,81 +151,193 @@ class CloudLLM:
         api_key: str,
         model: str = "gemini-1.5-pro",
         max_output_tokens: int = 512,
-        retries: int = 3
+        temperature: float = 0.15,
+        retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_cap: float = 16.0,
+        rpm: Optional[float] = None,
+        breaker_threshold: int = 5,
+        breaker_cooldown: float = 30.0,
+        response_cache: bool = False
     ):
-        if genai is None:
-            raise RuntimeError("google-generativeai not installed. pip install google-generativeai")
+        if httpx is None and genai is None:
+            raise RuntimeError("CloudLLM needs httpx or google-generativeai. pip install httpx")
 
         if not api_key:
             raise RuntimeError("CloudLLM needs an API key.")
 
-        genai.configure(api_key=api_key)
+        self.api_key = api_key
         self.model_name = model
         self.max_output_tokens = max_output_tokens
+        self.temperature = temperature
         self.retries = retries
-        
-        # Initialize the GenerativeModel instance
-        self.model = genai.GenerativeModel(
-            model_name=model,
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        # Client-side gates: an optional requests-per-minute bucket, and a
+        # cooldown set after a 429 so calls wait instead of hitting the API
+        self._limiter = TokenBucket(rpm) if rpm else None
+        self._cooldown_until = 0.0
+        # Fail fast during outages instead of every caller sitting through
+        # the full retry/backoff schedule
+        self._breaker = CircuitBreaker(breaker_threshold, breaker_cooldown)
+        # Repeat prompts answered from memory (opt-in)
+        self._cache = LLMCache() if response_cache else None
+        self._client = None
+        self._aclient = None
+        self._aclient_loop = None
+        self._endpoint = f"/models/{model}:generateContent"
+        self._generation_config = {
+            "maxOutputTokens": max_output_tokens,
+            "temperature": temperature
+        }
+
+        if httpx is not None:
+            # One client for the wrapper's lifetime: TCP/TLS set up once
+            self._client = httpx.Client(
+                base_url=GEMINI_API_BASE,
+                http2=HTTP2,
+                headers={"x-goog-api-key": api_key, "Content-Type": "application/json"},
+                timeout=60.0,
+                limits=HTTP_LIMITS
+            )
+
+        logger.info(f"CloudLLM initialized: {model} ({'REST' if self._client else 'SDK'})")
+
+    @cached_property
+    def model(self):
+        """SDK GenerativeModel, built on first use (None on the REST transport)"""
+        if self._client is not None or genai is None:
+            return None
+        model = genai.GenerativeModel(
+            model_name=self.model_name,
             generation_config={
-                "max_output_tokens": max_output_tokens,
-                "temperature": 0.15
+                "max_output_tokens": self.max_output_tokens,
+                "temperature": self.temperature
             }
         )
-        
-        logger.info(f"CloudLLM initialized: {model}")
+        model._client = _genai_client(self.api_key, genai_client.get_default_generative_client)
+        return model
 
     # -----------------------------------------------------------
-    # Extract text from ANY Gemini SDK response (all versions)
+    # REST transport
     # -----------------------------------------------------------
-    def _extract_text(self, r: Any) -> str:
-        if r is None:
-            return ""
+    def _request_body(self, prompt: str) -> bytes:
+        body = {
+            "contents": [{"role": "user", "parts": [{"text": prompt}]}],
+            "generationConfig": self._generation_config
+        }
+        if orjson is not None:
+            return orjson.dumps(body)
+        return json.dumps(body).encode("utf-8")
 
-        # v0.3+ (current SDK version)
-        if hasattr(r, "text"):
+    @staticmethod
+    def _parse_response(resp) -> Dict[str, Any]:
+        """Decode a generateContent response, raising LLMError on API errors"""
+        if resp.status_code >= 400:
             try:
-                return r.text or ""
+                message = resp.json()["error"]["message"]
             except Exception:
-                pass
-
-        # Try parts
-        if hasattr(r, "parts"):
+                message = resp.text[:200]
+            err = LLMError(f"Gemini API {resp.status_code}: {message}")
+            err.status_code = resp.status_code
             try:
-                return ''.join(part.text for part in r.parts if hasattr(part, 'text'))
-            except Exception:
-                pass
-        
-        # Try candidates
-        if hasattr(r, "candidates"):
+                err.retry_after = float(resp.headers["Retry-After"])
+            except (KeyError, ValueError):
+                err.retry_after = None
+            raise err
+        return orjson.loads(resp.content) if orjson is not None else resp.json()
+
+    def _prompt_key(self, prompt: str) -> str:
+        return LLMCache.make_key(self.model_name, prompt, self.max_output_tokens, self.temperature)
+
+    def _cache_key(self, prompt: str) -> Optional[str]:
+        if self._cache is None:
+            return None
+        return self._prompt_key(prompt)
+
+    def _circuit_open_result(self, start: float, attempts: int, last_err: Optional[str]) -> Dict[str, Any]:
+        return {
+            "text": "",
+            "error": "circuit_open",
+            "meta": {
+                "duration": time.perf_counter() - start,
+                "attempt": attempts,
+                "last_error": last_err
+            }
+        }
+
+    @staticmethod
+    def _is_outage(error: Exception) -> bool:
+        """Network errors and 5xx count towards the breaker; other 4xx don't"""
+        status = getattr(error, "status_code", None)
+        return status is None or status >= 500
+
+    @staticmethod
+    def _is_rate_limited(error: Exception) -> bool:
+        """429 from the REST transport, or the SDK's ResourceExhausted"""
+        return (getattr(error, "status_code", None) == 429
+                or getattr(error, "code", None) == 429
+                or type(error).__name__ == "ResourceExhausted")
+
+    def _gate_delay(self) -> float:
+        """Seconds left in the current rate-limit cooldown"""
+        return max(0.0, self._cooldown_until - time.monotonic())
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        """
+        Seconds to wait before the next attempt: the server's Retry-After
+        when given, else capped exponential backoff plus random jitter so
+        concurrent callers don't retry in lockstep.
+        """
+        retry_after = getattr(error, "retry_after", None)
+        if retry_after is not None:
+            return min(self.backoff_cap, retry_after)
+        return min(self.backoff_cap, self.backoff_base * 2 ** attempt) + random.uniform(0, self.backoff_base)
+
+    def _rest_generate(self, prompt: str, timeout: int) -> Dict[str, Any]:
+        resp = self._client.post(self._endpoint, content=self._request_body(prompt), timeout=timeout)
+        return self._parse_response(resp)
+
+    async def _rest_agenerate(self, prompt: str, timeout: int) -> Dict[str, Any]:
+        # Created lazily: an AsyncClient belongs to the loop that uses it,
+        # so a new loop (e.g. another asyncio.run) gets a new client
+        loop = asyncio.get_running_loop()
+        if self._aclient is None or self._aclient_loop is not loop:
+            self._aclient_loop = loop
+            self._aclient = httpx.AsyncClient(
+                base_url=GEMINI_API_BASE,
+                http2=HTTP2,
+                headers={"x-goog-api-key": self.api_key, "Content-Type": "application/json"},
+                timeout=60.0,
+                limits=HTTP_LIMITS
+            )
+        resp = await self._aclient.post(self._endpoint, content=self._request_body(prompt), timeout=timeout)
+        return self._parse_response(resp)
+
+    def close(self):
+        """Close the pooled sync client (use aclose() inside an event loop)"""
+        if self._client is not None:
+            self._client.close()
+
+    async def aclose(self):
+        """Close the pooled HTTP client(s) from inside the event loop"""
+        if self._aclient is not None:
+            await self._aclient.aclose()
+            self._aclient = None
+        if self._client is not None:
+            self._client.close()
+
+    # -----------------------------------------------------------
+    # Extract text from ANY Gemini SDK response (all versions)
+    # -----------------------------------------------------------
+    def _extract_text(self, r: Any) -> str:
+        extractor = _EXTRACTORS.get(type(r))
+        if extractor is not None:
             try:
-                if r.candidates and len(r.candidates) > 0:
-                    candidate = r.candidates[0]
-                    if hasattr(candidate, "content"):
-                        content = candidate.content
-                        if hasattr(content, "parts"):
-                            return ''.join(part.text for part in content.parts if hasattr(part, 'text'))
+                return extractor(r)
             except Exception:
                 pass
-
-        # Dict-like fallback
-        if isinstance(r, dict):
-            if "text" in r:
-                return r["text"]
-            if "output_text" in r:
-                return r["output_text"]
-            if "candidates" in r:
-                cands = r["candidates"]
-                if cands and isinstance(cands, list):
-                    c0 = cands[0]
-                    if isinstance(c0, dict):
-                        if "content" in c0:
-                            return str(c0["content"])
-                        if "text" in c0:
-                            return c0["text"]
-
-        # Last fallback
-        return str(r)
+        return _probe_text(r)
 
     # -----------------------------------------------------------
     # Generate response
@@ -113,38 +351,72 @@ class CloudLLM:
             timeout: Timeout in seconds (not strictly enforced by SDK)
             
         Returns:
-            Dict with keys: text, error, meta
+            Dict with keys: text, error, meta (concurrent identical prompts
+            share one call; the extra callers get meta.deduplicated=True)
         """
-        if genai is None:
+        return self._single_flight(self._prompt_key(prompt), lambda: self._generate(prompt, timeout))
+
+    def _generate(self, prompt: str, timeout: int) -> Dict[str, Any]:
+        if self._client is None and genai is None:
             return {"text": "", "error": "Gemini SDK missing", "meta": {}}
 
-        start = time.time()
+        cache_key = self._cache_key(prompt)
+        if cache_key is not None:
+            cached = self._cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        start = time.perf_counter()
         last_err = None
 
         for attempt in range(1, self.retries + 1):
+            if not self._breaker.allow():
+                return self._circuit_open_result(start, attempt - 1, last_err)
+            delay = self._gate_delay()
+            if delay:
+                time.sleep(delay)
+            if self._limiter is not None:
+                self._limiter.acquire()
             try:
-                # Use the correct SDK method
-                response = self.model.generate_content(prompt)
+                if self._client is not None:
+                    response = self._rest_generate(prompt, timeout)
+                else:
+                    # Use the correct SDK method
+                    response = self.model.generate_content(prompt)
                 
                 # Extract text from response
                 text = self._extract_text(response)
                 
-                return {
+                result = {
                     "text": text,
                     "error": None,
                     "meta": {
-                        "duration": time.time() - start,
+                        "duration": time.perf_counter() - start,
                         "attempt": attempt,
                         "model": self.model_name
                     }
                 }
+                self._breaker.record_success()
+                if cache_key is not None:
+                    self._cache.put(cache_key, result)
+                return result
 
             except Exception as e:
                 last_err = str(e)
                 logger.warning(f"CloudLLM attempt {attempt} failed: {e}")
                 
+                wait_time = self._backoff(attempt, e)
+                if self._is_rate_limited(e):
+                    # Hold back every caller of this instance, not just this one
+                    self._cooldown_until = time.monotonic() + wait_time
+                    # The API is up, just busy: not an outage
+                    self._breaker.release()
+                    continue
+                if self._is_outage(e):
+                    self._breaker.record_failure()
+                else:
+                    self._breaker.release()
                 if attempt < self.retries:
-                    wait_time = min(2 ** attempt, 8)
                     time.sleep(wait_time)
                 continue
 
@@ -154,7 +426,239 @@ class CloudLLM:
             "text": "",
             "error": last_err,
             "meta": {
-                "duration": time.time() - start,
+                "duration": time.perf_counter() - start,
                 "attempt": self.retries
             }
-        }
\ No newline at end of file
+        }
+
+    async def agenerate(self, prompt: str, timeout: int = 60) -> Dict[str, Any]:
+        """
+        Async variant of generate() for callers running an event loop.
+        Uses an async HTTP client (or the SDK's native async call), so many
+        concurrent requests share one thread instead of each blocking its own.
+        
+        Args:
+            prompt: The prompt text
+            timeout: Timeout in seconds per attempt
+            
+        Returns:
+            Dict with keys: text, error, meta
+        """
+        return await self._asingle_flight(self._prompt_key(prompt), lambda: self._agenerate(prompt, timeout))
+
+    async def _agenerate(self, prompt: str, timeout: int) -> Dict[str, Any]:
+        if self._client is None and genai is None:
+            return {"text": "", "error": "Gemini SDK missing", "meta": {}}
+
+        cache_key = self._cache_key(prompt)
+        if cache_key is not None:
+            cached = self._cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        start = time.perf_counter()
+        last_err = None
+
+        for attempt in range(1, self.retries + 1):
+            if not self._breaker.allow():
+                return self._circuit_open_result(start, attempt - 1, last_err)
+            delay = self._gate_delay()
+            if delay:
+                await asyncio.sleep(delay)
+            if self._limiter is not None:
+                await asyncio.to_thread(self._limiter.acquire)
+            try:
+                if self._client is not None:
+                    call = self._rest_agenerate(prompt, timeout)
+                elif hasattr(self.model, "generate_content_async"):
+                    if self.model._async_client is None:
+                        # Made here so it binds to the running loop
+                        self.model._async_client = _genai_client(
+                            self.api_key, genai_client.get_default_generative_async_client
+                        )
+                    call = self.model.generate_content_async(prompt)
+                else:
+                    # Older SDKs have no async call: run it on the default executor
+                    call = asyncio.get_running_loop().run_in_executor(
+                        None, self.model.generate_content, prompt
+                    )
+                response = await asyncio.wait_for(call, timeout=timeout)
+                result = {
+                    "text": self._extract_text(response),
+                    "error": None,
+                    "meta": {
+                        "duration": time.perf_counter() - start,
+                        "attempt": attempt,
+                        "model": self.model_name
+                    }
+                }
+                self._breaker.record_success()
+                if cache_key is not None:
+                    self._cache.put(cache_key, result)
+                return result
+
+            except Exception as e:
+                last_err = str(e) or type(e).__name__
+                logger.warning(f"CloudLLM attempt {attempt} failed: {e}")
+
+                wait_time = self._backoff(attempt, e)
+                if self._is_rate_limited(e):
+                    # Hold back every caller of this instance, not just this one
+                    self._cooldown_until = time.monotonic() + wait_time
+                    # The API is up, just busy: not an outage
+                    self._breaker.release()
+                    continue
+                if self._is_outage(e):
+                    self._breaker.record_failure()
+                else:
+                    self._breaker.release()
+                if attempt < self.retries:
+                    await asyncio.sleep(wait_time)
+
+        logger.error(f"CloudLLM failed after {self.retries} attempts: {last_err}")
+        return {
+            "text": "",
+            "error": last_err,
+            "meta": {
+                "duration": time.perf_counter() - start,
+                "attempt": self.retries
+            }
+        }
+
+    async def batch_generate(self, prompts: List[str], concurrency: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Run agenerate() over many prompts with at most `concurrency` requests
+        in flight (default: min(16, len(prompts))).
+        
+        Returns:
+            One result dict per prompt, in prompt order
+        """
+        if not prompts:
+            return []
+        sem = asyncio.Semaphore(concurrency or min(16, len(prompts)))
+
+        async def _one(prompt: str) -> Dict[str, Any]:
+            async with sem:
+                return await self.agenerate(prompt)
+
+        return await asyncio.gather(*[_one(p) for p in prompts])
+
+    @staticmethod
+    def _marshal_prompt(prompts: List[str]) -> str:
+        items = "\n".join(f"{i}) {p}" for i, p in enumerate(prompts, 1))
+        return (
+            f"Answer each of the {len(prompts)} numbered items below independently.\n"
+            f"Respond with only a JSON array of {len(prompts)} strings, "
+            f"one answer per item, in order.\n\n{items}"
+        )
+
+    @staticmethod
+    def _unmarshal_reply(text: str, n: int) -> Optional[List[str]]:
+        """The n answers from a marshalled reply, or None if it doesn't line up"""
+        start, end = text.find("["), text.rfind("]")
+        if start < 0 or end < start:
+            return None
+        try:
+            answers = json.loads(text[start:end + 1])
+        except ValueError:
+            return None
+        if not isinstance(answers, list) or len(answers) != n:
+            return None
+        return [a if isinstance(a, str) else json.dumps(a) for a in answers]
+
+    async def marshal_batch(
+        self,
+        prompts: List[str],
+        k: int = 8,
+        concurrency: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Like batch_generate(), but packs up to `k` prompts (capped at
+        MARSHAL_MAX_K) into each request and splits the JSON-array reply back
+        out, for many short homogeneous prompts where the RPM limit, not
+        latency, bounds throughput. Groups whose reply can't be aligned to
+        their prompts are retried one prompt per request.
+
+        Returns:
+            One result dict per prompt, in prompt order (meta.marshalled=k
+            for answers that came from a packed request)
+        """
+        if not prompts:
+            return []
+        k = max(1, min(k, MARSHAL_MAX_K))
+        groups = [prompts[i:i + k] for i in range(0, len(prompts), k)]
+        replies = await self.batch_generate([self._marshal_prompt(g) for g in groups], concurrency)
+
+        results: List[Optional[Dict[str, Any]]] = []
+        retry = []
+        for group, reply in zip(groups, replies):
+            answers = None if reply["error"] else self._unmarshal_reply(reply["text"], len(group))
+            if answers is None:
+                retry.extend(range(len(results), len(results) + len(group)))
+                results.extend([None] * len(group))
+                continue
+            meta = dict(reply["meta"], marshalled=len(group))
+            results.extend({"text": a, "error": None, "meta": meta} for a in answers)
+
+        if retry:
+            logger.warning(f"CloudLLM marshal_batch: {len(retry)} prompts retried individually")
+            for i, result in zip(retry, await self.batch_generate([prompts[i] for i in retry], concurrency)):
+                results[i] = result
+        return results
+
+    def batch_generate_sync(self, prompts: List[str], concurrency: Optional[int] = None) -> List[Dict[str, Any]]:
+        """batch_generate() for synchronous callers (not from inside a running loop)"""
+        return asyncio.run(self.batch_generate(prompts, concurrency))
+
+    def stream(self, prompt: str, timeout: int = 60) -> Iterator[str]:
+        """
+        Yield the response text as Gemini streams it (no retries: a failure
+        mid-stream can't be replayed without duplicating output).
+        """
+        if not self._breaker.allow():
+            raise LLMError("circuit_open: Gemini calls suspended after repeated failures")
+
+        # Abandoned mid-stream (consumer stopped early): no verdict
+        outcome = self._breaker.release
+        try:
+            yield from self._stream_chunks(prompt, timeout)
+            outcome = self._breaker.record_success
+        except Exception as e:
+            if self._is_outage(e) and not self._is_rate_limited(e):
+                outcome = self._breaker.record_failure
+            raise
+        finally:
+            outcome()
+
+    def _stream_chunks(self, prompt: str, timeout: int) -> Iterator[str]:
+        delay = self._gate_delay()
+        if delay:
+            time.sleep(delay)
+        if self._limiter is not None:
+            self._limiter.acquire()
+
+        if self._client is None:
+            for chunk in self.model.generate_content(prompt, stream=True):
+                text = self._extract_text(chunk)
+                if text:
+                    yield text
+            return
+
+        # Server-sent events: one "data: {...}" line per partial response
+        with self._client.stream(
+            "POST",
+            self._endpoint.replace(":generateContent", ":streamGenerateContent"),
+            params={"alt": "sse"},
+            content=self._request_body(prompt),
+            timeout=timeout
+        ) as resp:
+            if resp.status_code >= 400:
+                resp.read()
+                self._parse_response(resp)
+            for line in resp.iter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                text = self._extract_text(orjson.loads(data) if orjson is not None else json.loads(data))
+                if text:
+                    yield text
@@ -1,10 +1,15 @@
 # llm_wrappers/llm_local.py
 
-import os
 import time
+import asyncio
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, Iterator, List, Optional
+
+from llm_wrappers.cache import LLMCache
+from llm_wrappers.single_flight import SingleFlightMixin
 
 logger = logging.getLogger(__name__)
 
@@ -14,15 +19,38 @@ except Exception:
     Llama = None
     logger.debug("⚠️ llama-cpp-python not available")
 
+# KV-state caches keyed by prompt prefix (layout varies across versions)
+try:
+    from llama_cpp import LlamaRAMCache, LlamaDiskCache
+except Exception:
+    try:
+        from llama_cpp.llama_cache import LlamaRAMCache, LlamaDiskCache
+    except Exception:
+        LlamaRAMCache = LlamaDiskCache = None
+
+# In-memory prompt cache budget (llama-cpp-python's default is 2 GiB)
+PROMPT_CACHE_BYTES = 512 << 20
+
 
-class LocalLLM:
+class LocalLLM(SingleFlightMixin):
     """
     llama.cpp wrapper that supports:
     - consistent "text/error/meta" return
     - robust extraction across all llama-cpp versions
     """
 
-    def __init__(self, model_path: str, max_tokens: int = 512, n_ctx: int = 4096, temperature: float = 0.0):
+    def __init__(
+        self,
+        model_path: str,
+        max_tokens: int = 512,
+        n_ctx: int = 4096,
+        temperature: float = 0.0,
+        n_threads: Optional[int] = None,
+        n_batch: int = 512,
+        prompt_cache: bool = False,
+        prompt_cache_path: Optional[str] = None,
+        response_cache: bool = False
+    ):
         if Llama is None:
             raise RuntimeError("llama-cpp-python not installed.")
 
@@ -30,9 +58,49 @@ class LocalLLM:
         if not model_path.exists():
             raise FileNotFoundError(f"Local model not found: {model_path}")
 
-        self.model = Llama(model_path=str(model_path), n_ctx=n_ctx)
+        # n_threads=None keeps llama-cpp-python's default (about one thread
+        # per physical core; hyperthreads only slow decoding down); a larger
+        # n_batch speeds up prompt ingestion
+        self.model = Llama(
+            model_path=str(model_path),
+            n_ctx=n_ctx,
+            n_threads=n_threads,
+            n_batch=n_batch
+        )
+        self.model_path = str(model_path)
+        if prompt_cache:
+            self._enable_prompt_cache(prompt_cache_path)
         self.max_tokens = max_tokens
         self.temperature = temperature
+        # Repeat prompts answered from memory (opt-in)
+        self._cache = LLMCache() if response_cache else None
+        # A single Llama instance is not thread-safe: every model call holds
+        # this lock, and the parallelism comes from llama.cpp's own threads.
+        # Async callers queue on one worker so they don't tie up the loop.
+        self._model_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="llama")
+
+    def _enable_prompt_cache(self, path: Optional[str]):
+        """
+        Keep evaluated KV state keyed by prompt prefix, so prompts sharing the
+        same system/instruction prefix only process the new tokens. In memory
+        by default; on disk (survives restarts) when a path is given.
+
+        Opt-in (config: local_model.prompt_cache): the whole KV state is copied
+        after every call, and at large n_ctx the budget only holds a few
+        states, so it needs benchmarking on the target setup first.
+        """
+        if LlamaRAMCache is None:
+            logger.debug("⚠️ llama-cpp-python has no prompt cache; skipping")
+            return
+        try:
+            if path:
+                cache = LlamaDiskCache(cache_dir=str(Path(path).expanduser()))
+            else:
+                cache = LlamaRAMCache(capacity_bytes=PROMPT_CACHE_BYTES)
+            self.model.set_cache(cache)
+        except Exception as e:
+            logger.warning(f"Prompt cache unavailable: {e}")
 
     # -----------------------------------------------
     # Extract text from all llama-cpp response shapes
@@ -53,24 +121,94 @@ class LocalLLM:
     # -----------------------------------------------
     # Generate
     # -----------------------------------------------
+    def _prompt_key(self, prompt: str) -> str:
+        return LLMCache.make_key(self.model_path, prompt, self.max_tokens, self.temperature)
+
+    def warmup(self, timeout: int = 60) -> None:
+        """Fault the mmap'd weights in with a one-token decode"""
+        with self._model_lock:
+            self.model.create(prompt=" ", max_tokens=1)
+
     def generate(self, prompt: str, timeout: int = 60) -> Dict[str, Any]:
-        start = time.time()
+        # Concurrent identical prompts share one decode
+        return self._single_flight(self._prompt_key(prompt), lambda: self._generate(prompt, timeout))
+
+    def _generate(self, prompt: str, timeout: int) -> Dict[str, Any]:
+        cache_key = None
+        if self._cache is not None:
+            cache_key = self._prompt_key(prompt)
+            cached = self._cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        start = time.perf_counter()
 
         try:
-            out = self.model.create(
-                prompt=prompt,
-                max_tokens=self.max_tokens,
-                temperature=self.temperature
-            )
+            with self._model_lock:
+                out = self.model.create(
+                    prompt=prompt,
+                    max_tokens=self.max_tokens,
+                    temperature=self.temperature
+                )
 
             text = self._extract(out) or ""
 
-            return {
+            result = {
                 "text": text,
                 "error": None,
-                "meta": {"duration": time.time() - start}
+                "meta": {"duration": time.perf_counter() - start}
             }
+            if cache_key is not None:
+                self._cache.put(cache_key, result)
+            return result
 
         except Exception as e:
             logger.exception("Local LLM crashed")
             return {"text": "", "error": str(e), "meta": {}}
+
+    async def agenerate(self, prompt: str, timeout: int = 60) -> Dict[str, Any]:
+        """generate() on the model's worker thread, keeping the event loop free"""
+        loop = asyncio.get_running_loop()
+        return await self._asingle_flight(
+            self._prompt_key(prompt),
+            lambda: loop.run_in_executor(self._executor, self._generate, prompt, timeout)
+        )
+
+    def _generate_many(self, prompts: List[str]) -> List[Dict[str, Any]]:
+        # Identical prompts are decoded once
+        results: Dict[str, Dict[str, Any]] = {}
+        for prompt in prompts:
+            if prompt not in results:
+                results[prompt] = self.generate(prompt)
+        return [results[p] for p in prompts]
+
+    async def batch_generate(self, prompts: List[str]) -> List[Dict[str, Any]]:
+        """
+        generate() over many prompts in one hop to the model's worker thread,
+        results in prompt order. Prompts are decoded back to back on the
+        shared context; llama-cpp-python's high-level API has no multi-sequence
+        batched completion.
+        """
+        if not prompts:
+            return []
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._generate_many, list(prompts))
+
+    # -----------------------------------------------
+    # Stream
+    # -----------------------------------------------
+    def stream(self, prompt: str) -> Iterator[str]:
+        """
+        Yield the completion piece by piece as llama.cpp decodes it. The
+        model is held until the stream ends (or the generator is closed).
+        """
+        with self._model_lock:
+            for chunk in self.model(
+                prompt,
+                max_tokens=self.max_tokens,
+                temperature=self.temperature,
+                stream=True
+            ):
+                text = self._extract(chunk)
+                if text:
+                    yield text
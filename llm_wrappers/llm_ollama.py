@@ -1,31 +1,133 @@
 # llm_wrappers/llm_ollama.py
 
+import os
+import json
+import time
+import asyncio
 import subprocess
 import shutil
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, Iterator, List, Optional
+
+from llm_wrappers.cache import LLMCache
+from llm_wrappers.single_flight import SingleFlightMixin
 
 logger = logging.getLogger(__name__)
 
+try:
+    import httpx
+except Exception:
+    httpx = None
+    logger.debug("⚠️ httpx not available; OllamaLLM uses the CLI")
+
+try:
+    import orjson
+except Exception:
+    orjson = None
+
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://localhost:11434")
+if "://" not in OLLAMA_HOST:
+    OLLAMA_HOST = f"http://{OLLAMA_HOST}"
+
+# Once the server is found down, calls use the CLI and the server is
+# probed again after this many seconds
+PROBE_COOLDOWN = 30.0
+
 
-class OllamaLLM:
+def _loads(data):
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+class OllamaLLM(SingleFlightMixin):
     """
     Universal Ollama wrapper.
     Supports:
-    - `ollama run model`  (preferred)
-    - fallback: `ollama generate model --prompt`
+    - the Ollama server's HTTP API over a pooled client (preferred; the
+      server keeps the model resident between calls)
+    - fallback: `ollama run model`, then `ollama generate model --prompt`
     - Uniform return shape
     """
 
-    def __init__(self, model: str = "mistral"):
+    def __init__(self, model: str = "mistral", host: str = OLLAMA_HOST):
         self.model = model
+        self.host = host
+        self.session = None
+        self._aclient = None
+        self._aclient_loop = None
+        self.has_cli = shutil.which("ollama") is not None
+        # Monotonic time until which the server counts as down (0.0: up)
+        self._down_until = 0.0
+
+        reachable = False
+        if httpx is not None:
+            self.session = httpx.Client(base_url=host, headers=JSON_HEADERS, timeout=120.0)
+            reachable = self._probe()
+
+        if not reachable and not self.has_cli:
+            if self.session is not None:
+                self.session.close()
+            raise RuntimeError("Ollama server not reachable and Ollama CLI not installed or not on PATH.")
+
+    def _probe(self) -> bool:
+        """Ping the server, marking it up or down"""
+        try:
+            self.session.get("/api/tags", timeout=2.0).raise_for_status()
+        except Exception as e:
+            self._mark_down(e)
+            return False
+        self._down_until = 0.0
+        return True
+
+    def _mark_down(self, error: Exception):
+        logger.warning(
+            f"Ollama server not reachable at {self.host} ({error}); "
+            f"using CLI, retrying in {PROBE_COOLDOWN:.0f}s"
+        )
+        self._down_until = time.monotonic() + PROBE_COOLDOWN
+
+    def _use_http(self) -> bool:
+        """
+        Whether a call should go to the HTTP API: the server is up, or its
+        cooldown has passed and a fresh probe finds it back. Without the
+        CLI there is nothing else to try, so HTTP is always used.
+        """
+        if self.session is None:
+            return False
+        if not self._down_until or not self.has_cli:
+            return True
+        if time.monotonic() < self._down_until:
+            return False
+        return self._probe()
 
-        if shutil.which("ollama") is None:
-            raise RuntimeError("Ollama CLI not installed or not on PATH.")
+    def _request_body(self, prompt: str, stream: bool) -> bytes:
+        body = {"model": self.model, "prompt": prompt, "stream": stream}
+        if orjson is not None:
+            return orjson.dumps(body)
+        return json.dumps(body).encode("utf-8")
+
+    def _http_generate(self, prompt: str, timeout: int) -> Dict[str, Any]:
+        """Primary method: POST /api/generate on the Ollama server"""
+        r = self.session.post(
+            "/api/generate",
+            content=self._request_body(prompt, stream=False),
+            timeout=timeout
+        )
+        return self._http_result(r)
+
+    def _http_result(self, r) -> Dict[str, Any]:
+        r.raise_for_status()
+        data = _loads(r.content)
+        return {
+            "text": (data.get("response") or "").strip(),
+            "error": None,
+            "meta": {"duration": data.get("total_duration", 0) / 1e9, "model": self.model}
+        }
 
     def _run_ollama(self, prompt: str, timeout: int):
-        """Primary method: ollama run"""
-        p = subprocess.Popen(
+        """CLI method: ollama run"""
+        with subprocess.Popen(
             ["ollama", "run", self.model],
             stdin=subprocess.PIPE,
             stdout=subprocess.PIPE,
@@ -33,12 +135,18 @@ class OllamaLLM:
             text=True,
             encoding="utf-8",
             errors="ignore"
-        )
-        out, err = p.communicate(prompt, timeout=timeout)
+        ) as p:
+            try:
+                out, err = p.communicate(prompt, timeout=timeout)
+            except subprocess.TimeoutExpired:
+                # Kill and reap, otherwise the child and its pipes linger
+                p.kill()
+                p.communicate()
+                raise
         return p.returncode, out.strip(), err.strip()
 
     def _generate_ollama(self, prompt: str, timeout: int):
-        """Fallback: ollama generate"""
+        """Fallback: ollama generate (subprocess.run kills and reaps on timeout)"""
         p = subprocess.run(
             ["ollama", "generate", self.model, "--prompt", prompt],
             stdout=subprocess.PIPE,
@@ -53,13 +161,49 @@ class OllamaLLM:
     # -----------------------------------------------------
     # Generate
     # -----------------------------------------------------
+    def _prompt_key(self, prompt: str) -> str:
+        return LLMCache.make_key(self.model, prompt, 0, 0.0)
+
+    def warmup(self, timeout: int = 120) -> None:
+        """Have the server load the model (an empty prompt only loads it)"""
+        if not self._use_http():
+            return
+        self.session.post(
+            "/api/generate",
+            content=self._request_body("", stream=False),
+            timeout=timeout
+        ).raise_for_status()
+
     def generate(self, prompt: str, timeout: int = 120) -> Dict[str, Any]:
         if not isinstance(prompt, str):
             prompt = str(prompt)
+        # Concurrent identical prompts share one request
+        return self._single_flight(self._prompt_key(prompt), lambda: self._generate(prompt, timeout))
+
+    def _generate(self, prompt: str, timeout: int) -> Dict[str, Any]:
 
-        prompt = prompt.encode("utf-8", errors="ignore").decode("utf-8", errors="ignore")
+        # Drop lone surrogates, which can't be sent as UTF-8; ASCII never has any
+        if not prompt.isascii():
+            prompt = prompt.encode("utf-8", errors="ignore").decode("utf-8")
 
-        # ---- TRY RUN FIRST ----
+        # ---- HTTP API ----
+        if self._use_http():
+            try:
+                return self._http_generate(prompt, timeout)
+            except httpx.TimeoutException:
+                logger.error("❌ Ollama request timed out")
+                return {"text": "", "error": "Ollama timed out", "meta": {}}
+            except Exception as e:
+                if not self.has_cli:
+                    logger.exception("Ollama request failed")
+                    return {"text": "", "error": str(e), "meta": {}}
+                if isinstance(e, httpx.TransportError):
+                    # Server went away: use the CLI until the next probe
+                    self._mark_down(e)
+                else:
+                    logger.warning(f"Ollama request failed: {e}; falling back to CLI")
+
+        # ---- CLI: TRY RUN FIRST ----
         try:
             rc, out, err = self._run_ollama(prompt, timeout)
             if rc == 0:
@@ -82,3 +226,95 @@ class OllamaLLM:
         except Exception as e:
             logger.exception("Ollama generate crashed")
             return {"text": "", "error": str(e), "meta": {}}
+
+    # -----------------------------------------------------
+    # Async
+    # -----------------------------------------------------
+    async def agenerate(self, prompt: str, timeout: int = 120) -> Dict[str, Any]:
+        """
+        Async generate(). Concurrent calls are only decoded together if the
+        server allows it: set OLLAMA_NUM_PARALLEL on the Ollama server
+        (requests beyond it queue server-side). Identical concurrent prompts
+        share one request.
+        """
+        prompt = str(prompt)
+        return await self._asingle_flight(self._prompt_key(prompt), lambda: self._agenerate(prompt, timeout))
+
+    async def _agenerate(self, prompt: str, timeout: int) -> Dict[str, Any]:
+        # A due re-probe blocks for up to 2s: keep it off the event loop
+        use_http = await asyncio.to_thread(self._use_http) if self._down_until else self._use_http()
+        if not use_http:
+            # CLI: keep the blocking subprocess off the event loop
+            return await asyncio.to_thread(self.generate, prompt, timeout)
+
+        # One AsyncClient per event loop (clients are bound to their loop)
+        loop = asyncio.get_running_loop()
+        if self._aclient is None or self._aclient_loop is not loop:
+            self._aclient_loop = loop
+            self._aclient = httpx.AsyncClient(
+                base_url=self.host,
+                headers=JSON_HEADERS,
+                timeout=120.0,
+                limits=httpx.Limits(max_connections=32)
+            )
+        try:
+            r = await self._aclient.post(
+                "/api/generate",
+                content=self._request_body(prompt, stream=False),
+                timeout=timeout
+            )
+            return self._http_result(r)
+        except httpx.TimeoutException:
+            logger.error("❌ Ollama request timed out")
+            return {"text": "", "error": "Ollama timed out", "meta": {}}
+        except Exception as e:
+            if self.has_cli and isinstance(e, httpx.TransportError):
+                self._mark_down(e)
+                return await asyncio.to_thread(self.generate, prompt, timeout)
+            logger.warning(f"Ollama request failed: {e}")
+            return {"text": "", "error": str(e), "meta": {}}
+
+    async def batch_generate(self, prompts: List[str], concurrency: Optional[int] = None) -> List[Dict[str, Any]]:
+        """agenerate() over many prompts, at most `concurrency` (default 4) in flight, in prompt order"""
+        if not prompts:
+            return []
+        sem = asyncio.Semaphore(concurrency or min(4, len(prompts)))
+
+        async def _one(prompt: str) -> Dict[str, Any]:
+            async with sem:
+                return await self.agenerate(prompt)
+
+        return await asyncio.gather(*[_one(p) for p in prompts])
+
+    # -----------------------------------------------------
+    # Stream
+    # -----------------------------------------------------
+    def stream(self, prompt: str, timeout: int = 120) -> Iterator[str]:
+        """
+        Yield the completion as the server produces it (one JSON object
+        per line). Without the HTTP API the CLI result is yielded whole.
+        """
+        if not self._use_http():
+            result = self.generate(prompt, timeout)
+            if result["error"]:
+                raise RuntimeError(result["error"])
+            yield result["text"]
+            return
+
+        with self.session.stream(
+            "POST",
+            "/api/generate",
+            content=self._request_body(str(prompt), stream=True),
+            timeout=timeout
+        ) as r:
+            r.raise_for_status()
+            for line in r.iter_lines():
+                if not line:
+                    continue
+                data = _loads(line)
+                if data.get("error"):
+                    raise RuntimeError(data["error"])
+                if data.get("response"):
+                    yield data["response"]
+                if data.get("done"):
+                    break
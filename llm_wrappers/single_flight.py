@@ -0,0 +1,74 @@
+# llm_wrappers/single_flight.py
+
+"""
+Single-flight de-duplication for the LLM wrappers.
+
+When several callers send the same prompt at the same time, only the first
+actually calls the model; the rest wait for its result. Complements
+LLMCache, which only helps once a result exists.
+"""
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict
+
+
+def _shared(result: Dict[str, Any]) -> Dict[str, Any]:
+    # Waiters get their own dict so one caller mutating meta can't affect another
+    return {**result, "meta": dict(result.get("meta") or {}, deduplicated=True)}
+
+
+class SingleFlightMixin:
+    """Adds _single_flight (sync) and _asingle_flight (async) to a wrapper"""
+
+    def _flight_table(self, name: str) -> dict:
+        # Created on first use, so wrappers don't need to call a mixin __init__
+        return self.__dict__.setdefault(name, {})
+
+    def _single_flight(self, key: str, call: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """Run call() unless an identical one is already running on another thread"""
+        inflight = self._flight_table("_inflight")
+        lock = self.__dict__.get("_inflight_lock") or self.__dict__.setdefault("_inflight_lock", threading.Lock())
+        with lock:
+            future = inflight.get(key)
+            leader = future is None
+            if leader:
+                future = inflight[key] = Future()
+
+        if not leader:
+            return _shared(future.result())
+
+        try:
+            result = call()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with lock:
+                inflight.pop(key, None)
+
+    async def _asingle_flight(self, key: str, call: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        """Await call() unless an identical one is already pending on this loop"""
+        # Tasks are bound to their loop, so flights are tracked per loop
+        flight_key = (id(asyncio.get_running_loop()), key)
+        inflight = self._flight_table("_ainflight")
+
+        task = inflight.get(flight_key)
+        leader = task is None
+        if leader:
+            # A task of its own, so the call survives the first caller being
+            # cancelled while others still wait on it
+            task = inflight[flight_key] = asyncio.ensure_future(call())
+            task.add_done_callback(lambda t: self._land(inflight, flight_key, t))
+
+        result = await asyncio.shield(task)
+        return result if leader else _shared(result)
+
+    @staticmethod
+    def _land(inflight: dict, flight_key, task: "asyncio.Task"):
+        inflight.pop(flight_key, None)
+        # Mark the exception retrieved even if every waiter went away
+        if not task.cancelled():
+            task.exception()
@@ -1,20 +1,85 @@
 # local_rag.py
 
 import os
+import json
+import uuid
+import shutil
+import hashlib
 import logging
+import threading
+from collections import OrderedDict
+from functools import lru_cache
 from typing import List, Dict, Any, Optional, Tuple
-from math import isfinite
 
+import numpy as np
 import chromadb
 from sentence_transformers import SentenceTransformer
 from rank_bm25 import BM25Okapi
 
+try:
+    import torch
+except Exception:
+    torch = None
+
 from pdf_processor import PDFProcessor, get_pdf_files_recursive, get_organization_structure
 from config import get_config
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
+# bm25s scores with sparse matrix ops instead of rank_bm25's per-document
+# Python loop; rank_bm25 stays as the fallback
+try:
+    import bm25s
+except Exception:
+    bm25s = None
+    logger.debug("⚠️ bm25s not available; using rank_bm25")
+
+try:
+    import msgpack
+except Exception:
+    msgpack = None
+    logger.debug("⚠️ msgpack not available; saving the BM25 corpus as JSON")
+
+# BM25 state saved next to the Chroma data, so restarts skip the full
+# collection scan (bm25s indexes are memory-mapped back in; each save
+# writes a new "bm25_index.<id>" directory, named in the corpus file)
+BM25_CORPUS_FILE = "bm25_corpus.msgpack" if msgpack is not None else "bm25_corpus.json"
+BM25_INDEX_DIR = "bm25_index"
+
+# Chunks pooled across files before one embed + insert pass during
+# directory ingestion, and the largest single collection.add (Chroma
+# rejects batches above its max_batch_size, ~5k on SQLite)
+INGEST_FLUSH_CHUNKS = 2048
+CHROMA_ADD_BATCH = 4096
+
+# Floor for encode()'s batch size: one large call lets sentence-transformers
+# length-sort across the whole input, so batches carry little padding
+MIN_ENCODE_BATCH = 256
+
+# Recent query embeddings kept in memory (~1.5 MB at 384 dims)
+QUERY_EMBED_CACHE_SIZE = 1024
+
+
+def _tokenize(text: str) -> List[str]:
+    """BM25 tokenizer, shared by corpus and queries."""
+    return text.lower().split()
+
+
+@lru_cache(maxsize=512)
+def _tokenize_query(query: str) -> Tuple[str, ...]:
+    # tuples, so a cached result can't be mutated by a caller
+    return tuple(_tokenize(query))
+
+
+def _ids_fingerprint(ids: List[str]) -> str:
+    """Order-independent hash of a set of chunk ids"""
+    h = hashlib.blake2b(digest_size=16)
+    for cid in sorted(ids):
+        h.update(cid.encode('utf-8'))
+        h.update(b'\0')
+    return h.hexdigest()
+
 
 def _safe_get_first(lst):
     """Chroma often returns nested lists for single-query responses."""
@@ -24,6 +89,19 @@ def _safe_get_first(lst):
     return lst[0] if isinstance(lst[0], (list, tuple)) else lst
 
 
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first; ties keep index order like a stable sort."""
+    k = min(k, scores.size)
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    # O(N) selection of the k-th best score instead of sorting everything
+    kth = -np.partition(-scores, k - 1)[k - 1]
+    above = np.flatnonzero(scores > kth)
+    ties = np.flatnonzero(scores == kth)[:k - above.size]
+    top = np.concatenate((above, ties))
+    return top[np.argsort(-scores[top], kind='stable')]
+
 class MergedLocalRAG:
     def __init__(
         self,
@@ -37,17 +115,30 @@ class MergedLocalRAG:
         self.persist_directory = persist_directory or config.chroma_persist_dir
         self.model_name = model_name or config.embedding_model
         self.embed_batch_size = embed_batch_size or config.embed_batch_size
+        self.embedding_backend = config.embedding_backend
+        self.embedding_onnx_file = config.embedding_onnx_file
         self.enable_bm25 = enable_bm25 if enable_bm25 is not None else config.enable_bm25
 
         # Components
         self._initialize_chroma()
         self._initialize_embedder()
         self.pdf_processor = PDFProcessor()
+        self._query_emb_cache: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._query_emb_lock = threading.Lock()
 
-        # BM25 structures
+        # BM25 structures: the corpus mirrors the collection once loaded and
+        # is extended in place on ingest; self.bm25 is None while stale
         self.bm25 = None
         self.bm25_corpus: List[str] = []
         self.bm25_metadata: List[Dict[str, Any]] = []
+        self.bm25_tokenized_corpus: List[List[str]] = []
+        self.bm25_ids: List[str] = []
+        self._bm25_pos: Dict[str, int] = {}  # chunk id -> corpus position
+        self._bm25_loaded = False
+        # metadata value -> corpus positions, for filtered BM25 (built lazily)
+        self._bm25_filter_index: Optional[Dict[str, Dict[Any, np.ndarray]]] = None
+        if self.enable_bm25:
+            self._load_bm25_state()
 
         logger.info(f"🚀 MergedLocalRAG initialized (model={model_name}, bm25={enable_bm25})")
 
@@ -64,9 +155,24 @@ class MergedLocalRAG:
             raise
 
     def _initialize_embedder(self):
+        if self.embedding_backend == "onnx":
+            # Needs sentence-transformers>=3.2 with the onnx extra; falls
+            # back to the default backend when unavailable
+            try:
+                model_kwargs = {"file_name": self.embedding_onnx_file} if self.embedding_onnx_file else None
+                self.embedder = SentenceTransformer(self.model_name, backend="onnx", model_kwargs=model_kwargs)
+                logger.info(f"✅ Embedding model loaded: {self.model_name} (onnx, {self.embedding_onnx_file or 'model.onnx'})")
+                return
+            except Exception as e:
+                logger.warning(f"⚠️ ONNX embedding backend unavailable ({e}); using default backend")
         try:
             self.embedder = SentenceTransformer(self.model_name)
-            logger.info(f"✅ Embedding model loaded: {self.model_name}")
+            if torch is not None and torch.cuda.is_available():
+                # FP16 roughly doubles GPU encode throughput
+                self.embedder = self.embedder.to("cuda").half()
+                logger.info(f"✅ Embedding model loaded: {self.model_name} (cuda, fp16)")
+            else:
+                logger.info(f"✅ Embedding model loaded: {self.model_name}")
         except Exception as e:
             logger.exception("❌ Failed to load embedding model")
             raise
@@ -77,18 +183,81 @@ class MergedLocalRAG:
         return f"{base}|p{chunk.get('page_number',0)}|c{chunk.get('chunk_number',0)}"
 
     def _embed_texts(self, texts: List[str]) -> List[List[float]]:
-        """Batch embeddings to avoid memory spikes."""
-        embeddings = []
-        for i in range(0, len(texts), self.embed_batch_size):
-            batch = texts[i:i + self.embed_batch_size]
-            emb = self.embedder.encode(batch, show_progress_bar=False)
-            # ensure list-of-lists
-            emb_list = emb.tolist() if hasattr(emb, "tolist") else [list(e) for e in emb]
-            embeddings.extend(emb_list)
+        """Embed texts in one encode() call; sentence-transformers batches internally."""
+        if not texts:
+            return []
+        emb = self.embedder.encode(
+            texts,
+            batch_size=max(self.embed_batch_size, MIN_ENCODE_BATCH),
+            convert_to_numpy=True,
+            show_progress_bar=False
+        )
+        # plain lists at the Chroma boundary (older clients reject arrays)
+        return np.asarray(emb, dtype=np.float32).tolist()
+
+    def _chunk_records(self, file_info: Dict[str, str], chunks: List[Dict[str, Any]]) -> Tuple[List[str], List[str], List[Dict[str, Any]]]:
+        """ids, documents and normalized metadatas for one file's chunks."""
+        file_path = file_info['full_path']
+        ids, documents, metadatas = [], [], []
+        for chunk in chunks:
+            ids.append(self._chunk_id(file_info, chunk))
+            documents.append(chunk['text'])
+            # normalize metadata keys
+            md = {
+                'file_name': chunk.get('file_name', os.path.basename(file_path)),
+                'file_path': chunk.get('file_path', file_path),
+                'subject': file_info.get('subject'),
+                'module': file_info.get('module'),
+                'page_number': chunk.get('page_number'),
+                'chunk_number': chunk.get('chunk_number'),
+                'total_pages': chunk.get('total_pages', None)
+            }
+            metadatas.append(md)
+        return ids, documents, metadatas
+
+    def _add_chunks(self, ids: List[str], documents: List[str], metadatas: List[Dict[str, Any]]):
+        """Embed and add chunks to the collection (in slices Chroma accepts) and the BM25 corpus."""
+        embeddings = self._embed_texts(documents)
+        for i in range(0, len(ids), CHROMA_ADD_BATCH):
+            self.collection.add(
+                ids=ids[i:i + CHROMA_ADD_BATCH],
+                documents=documents[i:i + CHROMA_ADD_BATCH],
+                metadatas=metadatas[i:i + CHROMA_ADD_BATCH],
+                embeddings=embeddings[i:i + CHROMA_ADD_BATCH]
+            )
+        if self.enable_bm25:
+            self._extend_bm25_corpus(ids, documents, metadatas)
+
+    def _embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """_embed_texts for queries, served from an LRU of recent query embeddings."""
+        embeddings: List[Optional[List[float]]] = [None] * len(queries)
+        misses: Dict[str, List[int]] = {}
+        with self._query_emb_lock:
+            for i, q in enumerate(queries):
+                emb = self._query_emb_cache.get(q)
+                if emb is not None:
+                    self._query_emb_cache.move_to_end(q)
+                    embeddings[i] = emb
+                else:
+                    misses.setdefault(q, []).append(i)
+        if misses:
+            new = self._embed_texts(list(misses))
+            with self._query_emb_lock:
+                for (q, slots), emb in zip(misses.items(), new):
+                    for i in slots:
+                        embeddings[i] = emb
+                    self._query_emb_cache[q] = emb
+                    self._query_emb_cache.move_to_end(q)
+                while len(self._query_emb_cache) > QUERY_EMBED_CACHE_SIZE:
+                    self._query_emb_cache.popitem(last=False)
         return embeddings
 
-    def ingest_pdf(self, file_info: Dict[str, str], rebuild_bm25: bool = True) -> int:
-        """Ingest one PDF (file_info must contain 'full_path', 'subject', 'module')."""
+    def ingest_pdf(self, file_info: Dict[str, str], rebuild_bm25: bool = False) -> int:
+        """
+        Ingest one PDF (file_info must contain 'full_path', 'subject', 'module').
+        The new chunks are appended to the BM25 corpus; the index itself is
+        rebuilt on the next hybrid search, or right away with rebuild_bm25.
+        """
         try:
             file_path = file_info['full_path']
             chunks = self.pdf_processor.process_pdf(file_path)
@@ -96,42 +265,23 @@ class MergedLocalRAG:
                 logger.warning(f"⚠️ No text extracted from {file_path}")
                 return 0
 
-            ids, documents, metadatas = [], [], []
-            for chunk in chunks:
-                ids.append(self._chunk_id(file_info, chunk))
-                documents.append(chunk['text'])
-                # normalize metadata keys
-                md = {
-                    'file_name': chunk.get('file_name', os.path.basename(file_path)),
-                    'file_path': chunk.get('file_path', file_path),
-                    'subject': file_info.get('subject'),
-                    'module': file_info.get('module'),
-                    'page_number': chunk.get('page_number'),
-                    'chunk_number': chunk.get('chunk_number'),
-                    'total_pages': chunk.get('total_pages', None)
-                }
-                metadatas.append(md)
-
-            embeddings = self._embed_texts(documents)
-
-            # add to collection
-            self.collection.add(
-                ids=ids,
-                documents=documents,
-                metadatas=metadatas,
-                embeddings=embeddings
-            )
+            self._add_chunks(*self._chunk_records(file_info, chunks))
 
             logger.info(f"✅ Added {len(chunks)} chunks from {file_info.get('full_path')}")
             if self.enable_bm25 and rebuild_bm25:
-                self._rebuild_bm25_index()
+                self._ensure_bm25_index()
             return len(chunks)
 
         except Exception as e:
             logger.exception(f"❌ Failed to ingest {file_info.get('full_path')}: {e}")
             return 0
 
-    def ingest_directory(self, data_dir: str = "./data", rebuild_bm25: bool = True) -> Dict[str, Any]:
+    def ingest_directory(self, data_dir: str = "./data", rebuild_bm25: bool = True, workers: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Ingest every PDF under data_dir. Files are parsed in worker processes;
+        their chunks are pooled so embedding and Chroma inserts run in large
+        batches (flushed every INGEST_FLUSH_CHUNKS chunks).
+        """
         pdf_files = get_pdf_files_recursive(data_dir)
         results = {'total_files': 0, 'total_chunks': 0, 'by_subject': {}, 'by_module': {}}
 
@@ -140,67 +290,273 @@ class MergedLocalRAG:
             return results
 
         logger.info(f"📚 Processing {len(pdf_files)} PDF files from {data_dir}")
-        for file_info in pdf_files:
-            chunk_count = self.ingest_pdf(file_info, rebuild_bm25=False)
-            results['total_files'] += 1
-            results['total_chunks'] += chunk_count
-
-            subject = file_info.get('subject', 'unknown')
-            results['by_subject'].setdefault(subject, {'files': 0, 'chunks': 0})
-            results['by_subject'][subject]['files'] += 1
-            results['by_subject'][subject]['chunks'] += chunk_count
-
-            module_key = f"{subject}/{file_info.get('module','unknown')}"
-            results['by_module'].setdefault(module_key, {'files': 0, 'chunks': 0})
-            results['by_module'][module_key]['files'] += 1
-            results['by_module'][module_key]['chunks'] += chunk_count
-
-        # rebuild BM25 once after directory ingestion
+        pending_files, pending_ids, pending_docs, pending_mds = [], [], [], []
+
+        def flush():
+            if pending_ids:
+                try:
+                    self._add_chunks(pending_ids, pending_docs, pending_mds)
+                    for file_info, count in pending_files:
+                        logger.info(f"✅ Added {count} chunks from {file_info.get('full_path')}")
+                        self._tally(results, file_info, count)
+                except Exception as e:
+                    logger.exception(f"❌ Failed to ingest batch of {len(pending_files)} files: {e}")
+                    for file_info, _ in pending_files:
+                        self._tally(results, file_info, 0)
+            else:
+                for file_info, _ in pending_files:
+                    self._tally(results, file_info, 0)
+            for pending in (pending_files, pending_ids, pending_docs, pending_mds):
+                pending.clear()
+
+        processed = self.pdf_processor.process_many([f['full_path'] for f in pdf_files], workers)
+        for file_info, (file_path, chunks, error) in zip(pdf_files, processed):
+            if error:
+                logger.error(f"❌ Failed to ingest {file_path}: {error}")
+                chunks = []
+            elif not chunks:
+                logger.warning(f"⚠️ No text extracted from {file_path}")
+            ids, docs, mds = self._chunk_records(file_info, chunks or [])
+            pending_files.append((file_info, len(ids)))
+            pending_ids.extend(ids)
+            pending_docs.extend(docs)
+            pending_mds.extend(mds)
+            if len(pending_ids) >= INGEST_FLUSH_CHUNKS:
+                flush()
+        flush()
+
+        # build BM25 once after directory ingestion
         if self.enable_bm25 and rebuild_bm25:
-            self._rebuild_bm25_index()
+            self._ensure_bm25_index()
 
         logger.info(f"🎉 Ingested {results['total_chunks']} chunks from {results['total_files']} files")
         return results
 
+    @staticmethod
+    def _tally(results: Dict[str, Any], file_info: Dict[str, str], chunk_count: int):
+        results['total_files'] += 1
+        results['total_chunks'] += chunk_count
+
+        subject = file_info.get('subject', 'unknown')
+        results['by_subject'].setdefault(subject, {'files': 0, 'chunks': 0})
+        results['by_subject'][subject]['files'] += 1
+        results['by_subject'][subject]['chunks'] += chunk_count
+
+        module_key = f"{subject}/{file_info.get('module','unknown')}"
+        results['by_module'].setdefault(module_key, {'files': 0, 'chunks': 0})
+        results['by_module'][module_key]['files'] += 1
+        results['by_module'][module_key]['chunks'] += chunk_count
+
+    def _extend_bm25_corpus(self, ids: List[str], documents: List[str], metadatas: List[Dict[str, Any]]):
+        """Append newly added chunks to the in-memory BM25 corpus and mark the index stale."""
+        if not self._bm25_loaded:
+            # nothing loaded yet: the first build reads the whole collection,
+            # these chunks included
+            return
+        for cid, doc, md in zip(ids, documents, metadatas):
+            if cid in self._bm25_pos:
+                continue  # Chroma ignores re-added ids
+            self._bm25_pos[cid] = len(self.bm25_ids)
+            self.bm25_ids.append(cid)
+            self.bm25_corpus.append(doc)
+            self.bm25_metadata.append(md)
+            self.bm25_tokenized_corpus.append(_tokenize(doc))
+        self.bm25 = None
+        self._bm25_filter_index = None
+
+    @staticmethod
+    def _build_bm25(tokenized_corpus: List[List[str]]):
+        if bm25s is not None:
+            index = bm25s.BM25()
+            index.index(tokenized_corpus, show_progress=False)
+            return index
+        return BM25Okapi(tokenized_corpus)
+
+    def _bm25_scores(self, tokenized_q: List[str]):
+        """BM25 score of every corpus document for the query tokens."""
+        if not tokenized_q:
+            return np.zeros(len(self.bm25_corpus))
+        # float64 like rank_bm25 (bm25s returns float32, which json can't encode)
+        return np.asarray(self.bm25.get_scores(tokenized_q), dtype=np.float64)
+
+    def _bm25_filtered_positions(self, subject_filter: Optional[str], module_filter: Optional[str]) -> np.ndarray:
+        """Ascending corpus positions whose metadata matches the filters."""
+        if not subject_filter and not module_filter:
+            return np.arange(len(self.bm25_corpus))
+        if self._bm25_filter_index is None:
+            positions: Dict[str, Dict[Any, List[int]]] = {'subject': {}, 'module': {}}
+            for idx, md in enumerate(self.bm25_metadata):
+                md = md or {}
+                for key, by_value in positions.items():
+                    by_value.setdefault(md.get(key), []).append(idx)
+            self._bm25_filter_index = {
+                key: {value: np.asarray(idxs, dtype=np.int64) for value, idxs in by_value.items()}
+                for key, by_value in positions.items()
+            }
+        empty = np.empty(0, dtype=np.int64)
+        selected = None
+        for key, value in (('subject', subject_filter), ('module', module_filter)):
+            if not value:
+                continue
+            idxs = self._bm25_filter_index[key].get(value, empty)
+            selected = idxs if selected is None else np.intersect1d(selected, idxs, assume_unique=True)
+        return selected
+
+    def _ensure_bm25_index(self):
+        """Build the BM25 index if it is stale, loading the corpus from Chroma the first time."""
+        if self.bm25 is not None:
+            return
+        if not self._bm25_loaded:
+            self._rebuild_bm25_index()
+            return
+        if self.bm25_tokenized_corpus:
+            self.bm25 = self._build_bm25(self.bm25_tokenized_corpus)
+            logger.info(f"✅ BM25 index built with {len(self.bm25_corpus)} documents")
+            self._save_bm25_state()
+
+    def _bm25_corpus_path(self) -> str:
+        return os.path.join(self.persist_directory, BM25_CORPUS_FILE)
+
+    def _collection_ids(self) -> List[str]:
+        return _safe_get_first(self.collection.get(include=[]).get('ids', []))
+
+    def _save_bm25_state(self):
+        """Write corpus (and the bm25s index) to disk; failures only cost a rebuild later."""
+        corpus_path = self._bm25_corpus_path()
+        tmp = f"{corpus_path}.{os.getpid()}.tmp"
+        index_name = index_dir = None
+        try:
+            os.makedirs(self.persist_directory, exist_ok=True)
+            if bm25s is not None and isinstance(self.bm25, bm25s.BM25):
+                # A fresh directory per save, never replaced in place: the
+                # previous index may still be memory-mapped, and mapped files
+                # can't be replaced or deleted on Windows
+                index_name = f"{BM25_INDEX_DIR}.{uuid.uuid4().hex[:12]}"
+                index_dir = os.path.join(self.persist_directory, index_name)
+                self.bm25.save(index_dir, show_progress=False)
+            state = {
+                'ids': self.bm25_ids,
+                'fingerprint': _ids_fingerprint(self.bm25_ids),
+                'index_dir': index_name,
+                'documents': self.bm25_corpus,
+                'metadatas': self.bm25_metadata,
+                'tokens': self.bm25_tokenized_corpus,
+            }
+            with open(tmp, 'wb') as f:
+                if msgpack is not None:
+                    f.write(msgpack.packb(state, use_bin_type=True))
+                else:
+                    f.write(json.dumps(state, ensure_ascii=False).encode('utf-8'))
+            os.replace(tmp, corpus_path)
+        except Exception as e:
+            logger.warning(f"⚠️ Could not save BM25 state: {e}")
+            if index_dir is not None:
+                shutil.rmtree(index_dir, ignore_errors=True)
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            return
+        self._remove_bm25_indexes(keep=index_name)
+
+    def _remove_bm25_indexes(self, keep: Optional[str] = None):
+        """Delete saved index directories other than `keep` (any still mapped go on a later save)."""
+        try:
+            names = os.listdir(self.persist_directory)
+        except OSError:
+            return
+        for name in names:
+            if name.startswith(BM25_INDEX_DIR) and name != keep:
+                shutil.rmtree(os.path.join(self.persist_directory, name), ignore_errors=True)
+
+    def _load_bm25_state(self):
+        """Restore the saved BM25 corpus/index if it still matches the collection."""
+        corpus_path = self._bm25_corpus_path()
+        if not os.path.exists(corpus_path):
+            return
+        try:
+            with open(corpus_path, 'rb') as f:
+                raw = f.read()
+            state = msgpack.unpackb(raw, raw=False) if msgpack is not None else json.loads(raw)
+            ids = state['ids']
+            # Count first (cheap), then the ids themselves: a delete plus an
+            # add of the same size leaves the count unchanged
+            if (len(ids) != self.collection.count()
+                    or state.get('fingerprint') != _ids_fingerprint(self._collection_ids())):
+                logger.info("BM25 state on disk is out of date; it will be rebuilt")
+                return
+
+            self.bm25_ids = list(ids)
+            self._bm25_pos = {cid: i for i, cid in enumerate(ids)}
+            self.bm25_corpus = state['documents']
+            self.bm25_metadata = state['metadatas']
+            self.bm25_tokenized_corpus = state['tokens']
+            self._bm25_filter_index = None
+            self._bm25_loaded = True
+
+            self.bm25 = None
+            index_name = state.get('index_dir')
+            if bm25s is not None and index_name:
+                index_dir = os.path.join(self.persist_directory, index_name)
+                if os.path.isdir(index_dir):
+                    index = bm25s.BM25.load(index_dir, mmap=True, show_progress=False)
+                    if index.scores.get('num_docs') == len(ids):
+                        self.bm25 = index
+            logger.info(f"✅ BM25 state loaded from disk ({len(ids)} documents)")
+        except Exception as e:
+            logger.warning(f"⚠️ Could not load BM25 state ({e}); it will be rebuilt")
+            self.bm25 = None
+            self.bm25_corpus, self.bm25_metadata = [], []
+            self.bm25_tokenized_corpus, self.bm25_ids = [], []
+            self._bm25_pos = {}
+            self._bm25_loaded = False
+
     def _rebuild_bm25_index(self):
-        """Rebuild BM25 index from Chroma collection documents."""
+        """Rebuild BM25 corpus and index from Chroma collection documents."""
         try:
             all_docs = self.collection.get(include=['documents', 'metadatas'])
+            ids = _safe_get_first(all_docs.get('ids', []))
             documents = _safe_get_first(all_docs.get('documents', []))
             metadatas = _safe_get_first(all_docs.get('metadatas', []))
 
+            self.bm25_corpus = list(documents)
+            self.bm25_metadata = list(metadatas)
+            # reuse tokens of chunks already in memory; only new text is tokenized
+            known = dict(zip(self.bm25_ids, self.bm25_tokenized_corpus))
+            if known and len(ids) == len(documents):
+                self.bm25_tokenized_corpus = [known.get(cid) or _tokenize(doc) for cid, doc in zip(ids, documents)]
+            else:
+                self.bm25_tokenized_corpus = [_tokenize(doc) for doc in documents]
+            self.bm25_ids = list(ids)
+            self._bm25_pos = {cid: i for i, cid in enumerate(ids)}
+            self._bm25_filter_index = None
+            self._bm25_loaded = True
+
             if not documents:
                 logger.warning("No documents found for BM25 indexing")
                 self.bm25 = None
-                self.bm25_corpus = []
-                self.bm25_metadata = []
                 return
 
-            tokenized = [doc.lower().split() for doc in documents]
-            self.bm25 = BM25Okapi(tokenized)
-            self.bm25_corpus = documents
-            self.bm25_metadata = metadatas
+            self.bm25 = self._build_bm25(self.bm25_tokenized_corpus)
             logger.info(f"✅ BM25 index built with {len(documents)} documents")
+            self._save_bm25_state()
         except Exception as e:
             logger.exception(f"Failed to build BM25 index: {e}")
             self.bm25 = None
 
     def _normalize_similarity(self, distances: List[float]) -> List[float]:
         """Convert distances -> similarity (0..1) robustly."""
-        sims = []
-        # if distances are not finite, fallback to 0
-        # We also handle case where smaller distance = more similar.
-        max_d = max([d for d in distances if isfinite(d)] or [1.0])
-        min_d = min([d for d in distances if isfinite(d)] or [0.0])
-        denom = (max_d - min_d) if max_d != min_d else 1.0
-        for d in distances:
-            if not isfinite(d):
-                sims.append(0.0)
-            else:
-                # similarity = 1 - (d - min)/(max-min) ; clipped to [0,1]
-                val = 1.0 - ((d - min_d) / denom)
-                sims.append(min(1.0, max(0.0, val)))
-        return sims
+        # similarity = 1 - (d - min)/(max - min) over the finite distances,
+        # clipped to [0,1]; smaller distance = more similar, non-finite -> 0
+        d = np.asarray(distances, dtype=np.float64)
+        finite = np.isfinite(d)
+        if not finite.any():
+            return [0.0] * len(d)
+        dmin, dmax = d[finite].min(), d[finite].max()
+        denom = (dmax - dmin) if dmax != dmin else 1.0
+        sims = np.clip(1.0 - (d - dmin) / denom, 0.0, 1.0)
+        sims[~finite] = 0.0
+        return sims.tolist()
 
     def hybrid_search(
         self,
@@ -216,90 +572,113 @@ class MergedLocalRAG:
         """
         try:
             # Semantic search
-            query_emb = self._embed_texts([query])
-            where_filter = {}
-            if subject_filter: where_filter['subject'] = subject_filter
-            if module_filter: where_filter['module'] = module_filter
-
+            query_emb = self._embed_queries([query])
             semantic_raw = self.collection.query(
                 query_embeddings=query_emb,
                 n_results=n_results * 3,
-                where=where_filter if where_filter else None,
+                where=self._where_filter(subject_filter, module_filter),
                 include=["documents", "metadatas", "distances"]
             )
 
             sem_docs = _safe_get_first(semantic_raw.get('documents', []))
             sem_mds = _safe_get_first(semantic_raw.get('metadatas', []))
             sem_dists = _safe_get_first(semantic_raw.get('distances', []))
+            sem_ids = _safe_get_first(semantic_raw.get('ids', []))
 
-            semantic_scores = self._normalize_similarity(sem_dists if sem_dists else [0.0] * len(sem_docs))
-
-            combined = {}
-            # add semantic candidates
-            for doc, md, sscore in zip(sem_docs, sem_mds, semantic_scores):
-                # build predictable id
-                fid = f"{md.get('file_name','unk')}_p{md.get('page_number','0')}_c{md.get('chunk_number','0')}"
-                combined[fid] = {
-                    'document': doc,
-                    'metadata': md,
-                    'semantic_score': sscore,
-                    'bm25_score': 0.0
-                }
-
-            # BM25 search
-            if self.enable_bm25:
-                if self.bm25 is None:
-                    self._rebuild_bm25_index()
-                if self.bm25:
-                    tokenized_q = query.lower().split()
-                    bm25_scores_raw = self.bm25.get_scores(tokenized_q)
-                    # pair with metadata and apply filters
-                    bm25_candidates = []
-                    for idx, score in enumerate(bm25_scores_raw):
-                        md = self.bm25_metadata[idx] if idx < len(self.bm25_metadata) else {}
-                        if subject_filter and md.get('subject') != subject_filter:
-                            continue
-                        if module_filter and md.get('module') != module_filter:
-                            continue
-                        bm25_candidates.append({'idx': idx, 'score': score, 'meta': md, 'doc': self.bm25_corpus[idx]})
-                    bm25_candidates.sort(key=lambda x: x['score'], reverse=True)
-                    top_bm25 = bm25_candidates[:n_results * 3]
-
-                    max_b = max([c['score'] for c in top_bm25], default=1.0)
-                    for c in top_bm25:
-                        md = c['meta']
-                        doc_id = f"{md.get('file_name','unk')}_p{md.get('page_number','0')}_c{md.get('chunk_number','0')}"
-                        normalized = (c['score'] / max_b) if max_b > 0 else 0.0
-                        if doc_id in combined:
-                            combined[doc_id]['bm25_score'] = normalized
-                        else:
-                            combined[doc_id] = {
-                                'document': c['doc'],
-                                'metadata': md,
-                                'semantic_score': 0.0,
-                                'bm25_score': normalized
-                            }
-
-            # compute hybrid score & sort
-            for k, v in combined.items():
-                v['hybrid_score'] = semantic_weight * v.get('semantic_score', 0.0) + (1 - semantic_weight) * v.get('bm25_score', 0.0)
-
-            ranked = sorted(combined.values(), key=lambda x: x['hybrid_score'], reverse=True)[:n_results]
-
-            return {
-                'documents': [r['document'] for r in ranked],
-                'metadatas': [r['metadata'] for r in ranked],
-                'scores': [r['hybrid_score'] for r in ranked],
-                'semantic_scores': [r.get('semantic_score', 0.0) for r in ranked],
-                'bm25_scores': [r.get('bm25_score', 0.0) for r in ranked],
-                'query': query,
-                'total_results': len(ranked)
-            }
+            return self._hybrid_rank(query, sem_docs, sem_mds, sem_dists, n_results,
+                                     subject_filter, module_filter, semantic_weight, sem_ids)
 
         except Exception as e:
             logger.exception(f"❌ Hybrid search failed: {e}")
             return {'documents': [], 'metadatas': [], 'scores': [], 'query': query, 'total_results': 0}
 
+    @staticmethod
+    def _where_filter(subject_filter: Optional[str], module_filter: Optional[str]) -> Optional[Dict[str, str]]:
+        where_filter = {}
+        if subject_filter: where_filter['subject'] = subject_filter
+        if module_filter: where_filter['module'] = module_filter
+        return where_filter if where_filter else None
+
+    def _hybrid_rank(
+        self,
+        query: str,
+        sem_docs: List[str],
+        sem_mds: List[Dict[str, Any]],
+        sem_dists: List[float],
+        n_results: int,
+        subject_filter: Optional[str],
+        module_filter: Optional[str],
+        semantic_weight: float,
+        sem_ids: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """Merge one query's semantic candidates with BM25 and rank by hybrid score."""
+        semantic_scores = self._normalize_similarity(sem_dists if sem_dists else [0.0] * len(sem_docs))
+
+        bm25_keys: List[int] = []
+        bm25_norm = np.empty(0)
+        bm25_docs: List[str] = []
+        bm25_mds: List[Dict[str, Any]] = []
+        # BM25 search
+        if self.enable_bm25:
+            self._ensure_bm25_index()
+            if self.bm25:
+                tokenized_q = list(_tokenize_query(query))
+                positions = self._bm25_filtered_positions(subject_filter, module_filter)
+                # scores of the documents passing the filters
+                scores = self._bm25_scores(tokenized_q)[positions]
+                top = _top_k(scores, n_results * 3)
+
+                # normalized against the best hit (top is best first)
+                bm25_norm = scores[top]
+                if bm25_norm.size and bm25_norm[0] > 0:
+                    bm25_norm /= bm25_norm[0]
+                else:
+                    bm25_norm[:] = 0.0
+                bm25_keys = positions[top].tolist()
+                bm25_docs = [self.bm25_corpus[idx] for idx in bm25_keys]
+                bm25_mds = [self.bm25_metadata[idx] or {} for idx in bm25_keys]
+
+        # Candidates are keyed by corpus position, so a chunk found by both
+        # searches is merged; semantic hits outside the BM25 corpus get
+        # unique negative keys
+        n_sem = len(sem_docs)
+        ids = sem_ids if sem_ids and len(sem_ids) == n_sem else [None] * n_sem
+        sem_keys = [self._bm25_pos.get(cid, -1 - i) if cid is not None else -1 - i for i, cid in enumerate(ids)]
+        keys = np.asarray(sem_keys + bm25_keys, dtype=np.int64)
+        if not len(keys):
+            return {'documents': [], 'metadatas': [], 'scores': [], 'semantic_scores': [], 'bm25_scores': [],
+                    'query': query, 'total_results': 0}
+
+        # first[u]: first appearance of candidate u (semantic before BM25),
+        # which is both where its document comes from and the sort tiebreak
+        uniq, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+        sem = np.zeros(len(uniq))
+        bm = np.zeros(len(uniq))
+        sem[inverse[:n_sem]] = semantic_scores
+        bm[inverse[n_sem:]] = bm25_norm
+
+        hybrid = semantic_weight * sem + (1 - semantic_weight) * bm
+        order = np.lexsort((first, -hybrid))[:n_results]
+
+        docs, mds = [], []
+        for f in first[order].tolist():
+            if f < n_sem:
+                docs.append(sem_docs[f])
+                mds.append(sem_mds[f])
+            else:
+                docs.append(bm25_docs[f - n_sem])
+                mds.append(bm25_mds[f - n_sem])
+
+        return {
+            'documents': docs,
+            'metadatas': mds,
+            'scores': hybrid[order].tolist(),
+            'semantic_scores': sem[order].tolist(),
+            'bm25_scores': bm[order].tolist(),
+            'query': query,
+            'total_results': len(docs)
+        }
+
     def search(self, query: str, n_results: int = None, subject_filter: Optional[str] = None, module_filter: Optional[str] = None) -> Dict[str, Any]:
         """Default: use hybrid search if enabled, otherwise semantic only."""
         config = get_config()
@@ -308,19 +687,73 @@ class MergedLocalRAG:
             return self.hybrid_search(query, n_results, subject_filter, module_filter)
         # else fallback to semantic-only query
         try:
-            emb = self._embed_texts([query])
+            emb = self._embed_queries([query])
             results = self.collection.query(query_embeddings=emb, n_results=n_results,
-                                            where={'subject': subject_filter, 'module': module_filter} if (subject_filter or module_filter) else None,
+                                            where=self._where_filter(subject_filter, module_filter),
                                             include=["documents", "metadatas", "distances"])
             docs = _safe_get_first(results.get('documents', []))
             mds = _safe_get_first(results.get('metadatas', []))
             dists = _safe_get_first(results.get('distances', []))
-            sims = self._normalize_similarity(dists if dists else [0.0] * len(docs))
-            return {'documents': docs, 'metadatas': mds, 'distances': dists, 'similarities': sims, 'query': query, 'total_results': len(docs)}
+            return self._semantic_result(query, docs, mds, dists)
         except Exception as e:
             logger.exception(f"❌ Search failed: {e}")
             return {'documents': [], 'metadatas': [], 'distances': [], 'query': query, 'total_results': 0}
 
+    def _semantic_result(self, query: str, docs: List[str], mds: List[Dict[str, Any]], dists: List[float]) -> Dict[str, Any]:
+        sims = self._normalize_similarity(dists if dists else [0.0] * len(docs))
+        return {'documents': docs, 'metadatas': mds, 'distances': dists, 'similarities': sims, 'query': query, 'total_results': len(docs)}
+
+    def search_batch(
+        self,
+        queries: List[str],
+        n_results: int = None,
+        subject_filter: Optional[str] = None,
+        module_filter: Optional[str] = None,
+        semantic_weight: float = 0.7
+    ) -> List[Dict[str, Any]]:
+        """
+        search() for many queries at once: the queries are embedded in one
+        batch and sent to Chroma as a single multi-query call, then each is
+        ranked (hybrid or semantic) on its own. Returns one result per query,
+        in order.
+        """
+        config = get_config()
+        n_results = n_results or config.default_search_results
+        queries = list(queries)
+        if not queries:
+            return []
+
+        hybrid = config.enable_bm25
+        try:
+            raw = self.collection.query(
+                query_embeddings=self._embed_queries(queries),
+                n_results=n_results * 3 if hybrid else n_results,
+                where=self._where_filter(subject_filter, module_filter),
+                include=["documents", "metadatas", "distances"]
+            )
+        except Exception as e:
+            logger.exception(f"❌ Batch search failed: {e}")
+            return [{'documents': [], 'metadatas': [], 'scores': [], 'query': q, 'total_results': 0} for q in queries]
+
+        # Chroma returns one inner list per query
+        all_docs = raw.get('documents') or [[] for _ in queries]
+        all_mds = raw.get('metadatas') or [[] for _ in queries]
+        all_dists = raw.get('distances') or [[] for _ in queries]
+        all_ids = raw.get('ids') or [[] for _ in queries]
+
+        results = []
+        for query, docs, mds, dists, ids in zip(queries, all_docs, all_mds, all_dists, all_ids):
+            if not hybrid:
+                results.append(self._semantic_result(query, docs, mds, dists))
+                continue
+            try:
+                results.append(self._hybrid_rank(query, docs, mds, dists, n_results,
+                                                 subject_filter, module_filter, semantic_weight, ids))
+            except Exception as e:
+                logger.exception(f"❌ Hybrid search failed: {e}")
+                results.append({'documents': [], 'metadatas': [], 'scores': [], 'query': query, 'total_results': 0})
+        return results
+
     def get_collection_stats(self) -> Dict[str, Any]:
         try:
             count = 0
@@ -352,6 +785,18 @@ class MergedLocalRAG:
             logger.exception("❌ Failed to get collection stats")
             return {'total_chunks': 0, 'subjects': [], 'modules': []}
 
+    def get_index_fingerprint(self) -> Optional[str]:
+        """
+        Hash of the collection's chunk ids: changes whenever chunks are
+        ingested or the database is cleared (add() never rewrites an
+        existing id). None if the collection can't be read.
+        """
+        try:
+            return _ids_fingerprint(self._collection_ids())
+        except Exception:
+            logger.exception("❌ Failed to fingerprint the collection")
+            return None
+
     def get_organization_info(self) -> Dict[str, Any]:
         stats = self.get_collection_stats()
         file_structure = {}
@@ -366,9 +811,19 @@ class MergedLocalRAG:
             self.client.delete_collection("engineering_documents")
             self.collection = self.client.get_or_create_collection("engineering_documents")
             logger.info("🗑️ Database cleared successfully")
-            # clear BM25
+            # clear BM25 (the empty collection is the loaded state); drop
+            # the index first so a memory-mapped one releases its files
             self.bm25 = None
+            corpus_path = self._bm25_corpus_path()
+            if os.path.exists(corpus_path):
+                os.remove(corpus_path)
+            self._remove_bm25_indexes()
             self.bm25_corpus = []
             self.bm25_metadata = []
+            self.bm25_tokenized_corpus = []
+            self.bm25_ids = []
+            self._bm25_pos = {}
+            self._bm25_filter_index = None
+            self._bm25_loaded = True
         except Exception as e:
             logger.exception("❌ Failed to clear database")
@@ -11,7 +11,7 @@ from config import get_config, paths
 from local_rag import MergedLocalRAG
 from pdf_processor import get_pdf_files_recursive
 from models import SourceDocument
-from services import QueryService
+from services import PromptBuilder, QueryService
 from factories import LLMFactory
 from handlers import CommandHandler
 
@@ -66,8 +66,6 @@ class AIIntegration:
         Returns:
             Generated answer text
         """
-        from services import PromptBuilder
-        
         # Select LLM
         if use_cloud and self.cloud_llm:
             llm = self.cloud_llm
@@ -179,6 +177,36 @@ class AthenaApp:
 
         return True
 
+    def auto_answer_question(
+        self,
+        question: str,
+        subject_filter: Optional[str] = None,
+        module_filter: Optional[str] = None,
+        use_cloud: bool = False
+    ) -> str:
+        """
+        Answer a single question end-to-end (used by the auto-solver).
+        
+        Args:
+            question: The question text
+            subject_filter: Optional subject filter for search
+            module_filter: Optional module filter for search
+            use_cloud: Whether to use cloud LLM
+            
+        Returns:
+            Answer text
+        """
+        if self.query_service is None:
+            self.initialize_rag()
+
+        result = self.query_service.execute_query(
+            question=question,
+            use_cloud=use_cloud,
+            subject_filter=subject_filter,
+            module_filter=module_filter
+        )
+        return result.answer
+
     def interactive_session(self):
         """
         Interactive Q&A session.
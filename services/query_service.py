@@ -5,6 +5,7 @@ Consolidates: search → cache check → generate → cache save
 import logging
 from typing import Optional
 
+from config import get_config
 from models import QueryResult, SearchResults, SourceDocument
 from services.prompt_builder import PromptBuilder
 from utils.llm_cache import question_hash, load_cached_answer, save_cached_answer
@@ -51,9 +52,9 @@ class QueryService:
             QueryResult with answer and sources
         """
         # Step 1: Search for relevant documents
-        logger.info("🔍 Searching for: %s", question[:100])
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("🔍 Searching for: %s", question[:100])
         
-        from config import get_config
         config = get_config()
         n_results = n_results or config.default_search_results
         
@@ -133,7 +134,8 @@ class QueryService:
                 "mode": "cloud" if use_cloud else "local"
             }
             save_cached_answer(cache_key, cache_payload)
-            logger.debug("💾 Saved to cache: %s", cache_key[:16])
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("💾 Saved to cache: %s", cache_key[:16])
         except Exception as e:
             logger.warning("Failed to save cache: %s", e)
     
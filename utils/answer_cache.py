@@ -0,0 +1,69 @@
+# /utils/answer_cache.py
+"""
+Persistent answer cache for the auto-solver, backed by SQLite.
+
+Keyed on the question together with everything that shapes the answer
+(mode, model, knowledge-base fingerprint, subject/module filters), so a
+re-run over the same paper skips retrieval and generation entirely, and
+ingesting or clearing documents starts it afresh.
+"""
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from config import paths
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_FILE = paths.get_cache_file("answers.sqlite3")
+
+
+def answer_key(question: str, mode: str, model: str,
+               subject_filter: Optional[str] = None,
+               module_filter: Optional[str] = None,
+               index_fingerprint: str = "") -> str:
+    """Stable cache key for a question under a given mode/model/index/filter setup"""
+    key = "|".join([mode, model, index_fingerprint, subject_filter or "", module_filter or "", question])
+    return hashlib.md5(key.encode("utf-8")).hexdigest()
+
+
+class AnswerCache:
+    """Thread-safe key -> answer store (one connection, WAL journal)"""
+
+    def __init__(self, db_file=DEFAULT_DB_FILE):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(db_file), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS answers(key TEXT PRIMARY KEY, answer TEXT, ts INTEGER)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        """Cached answer for key, or None"""
+        try:
+            with self._lock:
+                row = self._conn.execute("SELECT answer FROM answers WHERE key=?", (key,)).fetchone()
+        except sqlite3.Error as e:
+            logger.warning("Answer cache read error: %s", e)
+            return None
+        return row[0] if row else None
+
+    def put(self, key: str, answer: str):
+        """Store (or replace) the answer for key"""
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO answers(key, answer, ts) VALUES (?, ?, ?)",
+                    (key, answer, int(time.time()))
+                )
+                self._conn.commit()
+        except sqlite3.Error as e:
+            logger.warning("Answer cache write error: %s", e)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
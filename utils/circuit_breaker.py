@@ -0,0 +1,53 @@
+# /utils/circuit_breaker.py
+"""
+Thread-safe circuit breaker for outbound LLM calls.
+"""
+import threading
+import time
+
+
+class CircuitBreaker:
+    """
+    Closed -> open after `threshold` consecutive failures; while open, calls
+    are refused for `cooldown` seconds. After that one probe call is let
+    through (half-open): success closes the circuit, failure re-opens it.
+    """
+
+    def __init__(self, threshold: int = 5, cooldown: float = 30.0):
+        self.threshold = max(1, threshold)
+        self.cooldown = cooldown
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self._failures >= self.threshold
+
+    def allow(self) -> bool:
+        """Whether a call may go out now (claims the probe when half-open)"""
+        with self._lock:
+            if self._failures < self.threshold:
+                return True
+            if self._probing or time.monotonic() - self._opened_at < self.cooldown:
+                return False
+            self._probing = True
+            return True
+
+    def release(self):
+        """Neither success nor failure (e.g. rate limited): free the probe"""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self._failures >= self.threshold:
+                self._opened_at = time.monotonic()
@@ -1,28 +1,83 @@
 """
 LLM response caching utility - now using centralized configuration
+
+Two tiers: an in-process LRU of recently used answers in front of the
+per-answer JSON files, so hot questions skip the disk read and decode.
 """
 import json
 import hashlib
+import logging
+import threading
+from collections import OrderedDict
 from pathlib import Path
 
 from config import get_config, paths
 
+logger = logging.getLogger(__name__)
+
+# xxh3 is several times faster than sha256 on short keys like these
+try:
+    import xxhash
+except Exception:
+    xxhash = None
+    logger.debug("⚠️ xxhash not available; using sha256 for cache keys")
+
+# Entries are only read back by Python, so store them as msgpack (faster
+# to encode/decode and smaller than indented JSON) when it is installed
+try:
+    import msgpack
+except Exception:
+    msgpack = None
+    logger.debug("⚠️ msgpack not available; storing cache entries as JSON")
+
+CACHE_EXT = ".msgpack" if msgpack is not None else ".json"
+
 # Get cache directory from config
 CACHE_DIR = paths.CACHE_DIR
 
+# Hot tier: qhash -> payload, most recently used last
+_hot: "OrderedDict[str, dict]" = OrderedDict()
+_hot_lock = threading.RLock()
+
+
+def _remember(qhash: str, payload: dict):
+    """Insert/refresh an entry in the hot tier, evicting the oldest"""
+    with _hot_lock:
+        _hot[qhash] = payload
+        _hot.move_to_end(qhash)
+        while len(_hot) > get_config().cache_hot_entries:
+            _hot.popitem(last=False)
+
 
 def question_hash(question: str, context_ids: list) -> str:
     """Generate unique hash for question + context combination"""
+    if xxhash is not None:
+        h = xxhash.xxh3_128(question.encode("utf-8"))
+        for cid in context_ids or ():
+            h.update(b"\0")
+            h.update(cid.encode("utf-8"))
+        return h.hexdigest()
     key = question + "|" + "|".join(context_ids or [])
     return hashlib.sha256(key.encode("utf-8")).hexdigest()
 
 
 def load_cached_answer(qhash: str):
     """Load cached answer if it exists"""
-    cache_file = CACHE_DIR / f"{qhash}.json"
+    with _hot_lock:
+        payload = _hot.get(qhash)
+        if payload is not None:
+            _hot.move_to_end(qhash)
+            return payload
+
+    cache_file = CACHE_DIR / f"{qhash}{CACHE_EXT}"
     if cache_file.exists():
         try:
-            return json.loads(cache_file.read_text(encoding="utf-8"))
+            if msgpack is not None:
+                payload = msgpack.unpackb(cache_file.read_bytes(), raw=False)
+            else:
+                payload = json.loads(cache_file.read_text(encoding="utf-8"))
+            _remember(qhash, payload)
+            return payload
         except Exception as e:
             print(f"Cache read error: {e}")
             return None
@@ -30,12 +85,16 @@ def load_cached_answer(qhash: str):
 
 
 def save_cached_answer(qhash: str, payload: dict):
-    """Save answer to cache"""
-    cache_file = CACHE_DIR / f"{qhash}.json"
+    """Save answer to cache (memory and disk)"""
+    _remember(qhash, payload)
+    cache_file = CACHE_DIR / f"{qhash}{CACHE_EXT}"
     try:
-        cache_file.write_text(
-            json.dumps(payload, ensure_ascii=False, indent=2), 
-            encoding="utf-8"
-        )
+        if msgpack is not None:
+            cache_file.write_bytes(msgpack.packb(payload, use_bin_type=True))
+        else:
+            cache_file.write_text(
+                json.dumps(payload, ensure_ascii=False, indent=2), 
+                encoding="utf-8"
+            )
     except Exception as e:
         print(f"Cache write error: {e}")
\ No newline at end of file
@@ -0,0 +1,30 @@
+# /utils/rate_limiter.py
+"""
+Thread-safe token-bucket rate limiter for outbound LLM calls.
+"""
+import threading
+import time
+
+
+class TokenBucket:
+    """Allow up to `rate_per_minute` acquisitions per minute, with bursts up to `burst`"""
+
+    def __init__(self, rate_per_minute: float, burst: int = 1):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, then take it"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)